@@ -1,29 +1,79 @@
 import logging
 import dash
 import click
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
 
 from utils import FigureGenerator
-from utils import FEATURES, TIME_RANGES, COLUMNS_FOR_DATA_TABLE, APP_INPUTS
-from utils.data_workflow import get_filtered_data, get_global_data
-from settings import DATA_FILES
-from app_layout import generate_app_layout
+from utils import FEATURES, COLUMNS_FOR_DATA_TABLE, POINT_BUDGETS, HEATMAP_BINS, BOOK_DEPTH, FEATURE_LEVELS
+from utils.data_workflow import get_filtered_data, clean_cache, global_store, get_zoomed_data, \
+    zoom_range, get_table_page, get_quote_data, loading_progress, filter_window, args_to_hashable_kwargs, \
+    get_book_levels, get_feature_data, get_plot_data, is_partitioned
+from utils.loading import load_in_background, warm_up_cache
+from utils.live import follow, can_follow
+from utils.catalog import scan_catalog, read_manifest, msuk_options
+from utils.figure_cache import figure_cache, cached_figure
+from settings import FIGURE_CACHE, COMPACT_NUMERICS
+from app_layout import generate_app_layout, date_picker_bounds
 
 
 app = dash.Dash(__name__)
+# figures are cached on disk, shared by all the workers serving the app
+figure_cache.init_app(app.server, config=FIGURE_CACHE)
 DATA_FILTERING_INPUTS = [Input('date_picker', 'date'), Input('msuk_selector', 'value'), Input('use_cache', 'children'),
                Input('hour_slider', 'value'), Input('minute_slider', 'value'),
                Input('second_slider', 'value'), Input('micros_slider', 'value')]
+DATA_FILTERING_STATES = [State(dependency.component_id, dependency.component_property)
+                         for dependency in DATA_FILTERING_INPUTS]
 
-@app.callback([Output('signal_data_ready', 'children'), Output('msuk_selector', 'options')],
-              [Input('file', 'value'), Input('use_cache', 'children')])
-def load_data_from_file_selector(file_path, use_cache):
+@app.callback([Output('signal_data_ready', 'children'), Output('msuk_selector', 'options'),
+               Output('loading_progress', 'value'), Output('loading_status', 'children'),
+               Output('loading_interval', 'disabled')],
+              [Input('file', 'value'), Input('use_cache', 'children'), Input('loading_interval', 'n_intervals')])
+def load_data_from_file_selector(file_path, use_cache, _):
     """
     Handles loading the data from disk, but only when a different file is selected.
-    Data is cached for quick use by filtering function.
+    The file is loaded in the background, its progress is polled on the ticks of loading_interval until it is loaded.
+    Data is cached for quick use by filtering function, the selected file is pinned in the cache.
+    Files with a fresh partitioned cache are not loaded: a single msuk and date is read from its partition, the views
+    needing more load the file from the cache on demand.
     """
-    _, msuks_options =  get_global_data(file_path, use_cache)
-    return file_path, msuks_options
+    if not file_path:
+        raise PreventUpdate
+    # msuks are known from the catalog if the file was loaded before
+    catalog_msuks = msuk_options(read_manifest().get(file_path, {}))
+    if use_cache and catalog_msuks and not global_store.contains(file_path, use_cache) \
+            and is_partitioned(file_path, downcast=COMPACT_NUMERICS):
+        global_store.unpin_all()
+        global_store.pin(file_path, use_cache)
+        return file_path, catalog_msuks, 100, f"{file_path} ready", True
+
+    # failed files are loaded again when selected again, ticks of loading_interval only poll the job of the file
+    triggered = [trigger['prop_id'] for trigger in dash.callback_context.triggered]
+    job = load_in_background(file_path, use_cache, retry='loading_interval.n_intervals' not in triggered)
+    if not job.done():
+        progress = loading_progress(file_path)
+        return dash.no_update, catalog_msuks, 100 * progress, f"Loading {file_path}: {progress:.0%}", False
+    if job.exception() is not None:
+        app.logger.error(f"Could not load {file_path}: {job.exception()}")
+        return dash.no_update, [], 0, f"Could not load {file_path}: {job.exception()}", True
+
+    global_store.unpin_all()
+    global_store.pin(file_path, use_cache)
+    _, msuks_options = job.result()
+    app.logger.info(f"Data store: {global_store.cache_info()}")
+    return file_path, msuks_options, 100, f"{file_path} loaded", True
+
+
+@app.callback([Output('date_picker', 'min_date_allowed'), Output('date_picker', 'max_date_allowed'),
+               Output('date_picker', 'initial_visible_month')],
+              [Input('file', 'value'), Input('signal_data_ready', 'children')])
+def update_date_picker(file_path, _):
+    """
+    Bounds the date picker to the dates of the selected file, from the catalog
+    """
+    bounds = date_picker_bounds(read_manifest().get(file_path, {}))
+    return bounds['min_date_allowed'], bounds['max_date_allowed'], bounds['initial_visible_month']
 
 
 @app.callback(Output('signal_data_filtered', 'children'),
@@ -32,40 +82,135 @@ def filter_dataframe(file_path, *args):
     """
     Handles filtering data from loaded data. Data is cached and rapidly accessible to other callbacks
     """
-    _ = get_filtered_data(file_path, *args)
+    # no file is ready while the selected one loads in the background, the filters still trigger the callbacks
+    if not file_path:
+        raise PreventUpdate
+    _ = get_filtered_data(file_path, *args), get_quote_data(file_path, *args)
     return file_path
 
 
-@app.callback([Output('table', 'data'), Output('time_series', 'figure'), Output('bid_ask', 'figure'),
-               Output('depth', 'figure'), Output('size_imbalance', 'figure')],
-              [Input('feature_selector', 'value'), Input('signal_data_filtered', 'children'),] + DATA_FILTERING_INPUTS)
-def update_figure(feature, *args):
+@app.callback(Output('size_imbalance', 'figure'),
+              [Input('signal_data_filtered', 'children')] + DATA_FILTERING_INPUTS)
+def update_figure(*args):
     """
-    Updates figure from filtered data
+    Updates size imbalance figure from filtered data, with the imbalance of each level of the book
     """
-    filtered_df = get_filtered_data(*args)
-    bid_ask_df = filtered_df.drop_duplicates(subset='datetime')
-
-    df_to_display = filtered_df[COLUMNS_FOR_DATA_TABLE].to_dict('records')
-    figure = FigureGenerator.figure(bid_ask_df, feature)
-    bid_ask_fig = FigureGenerator.bid_ask_figure(bid_ask_df)
-    depth_fig = FigureGenerator.depth_cum_figure(filtered_df)
-    size_imbalance_fig = FigureGenerator.size_imbalance_figure(bid_ask_df)
+    if not args[0]:
+        raise PreventUpdate
+    levels = [f'imbalance_{level}' for level in range(1, FEATURE_LEVELS + 1)]
+    build = lambda: FigureGenerator.size_imbalance_figure(
+        get_plot_data(None, POINT_BUDGETS['size_imbalance_figure'], *args), get_feature_data(None, levels, *args))
+    size_imbalance_fig = cached_figure('size_imbalance', build, args)
 
     app.logger.info("Data loaded for figure updates.")
-    return df_to_display, figure, bid_ask_fig, depth_fig, size_imbalance_fig
+    return size_imbalance_fig
+
+
+@app.callback([Output('table', 'data'), Output('table', 'page_count'), Output('table_row_count', 'children')],
+              [Input('table', 'page_current'), Input('table', 'page_size'), Input('table', 'sort_by'),
+               Input('table', 'filter_query'), Input('signal_data_filtered', 'children')] + DATA_FILTERING_INPUTS)
+def update_table(page_current, page_size, sort_by, filter_query, *args):
+    """
+    Updates the current page of the table, sorting and filtering the whole filtered data on the server
+    """
+    if not args[0]:
+        raise PreventUpdate
+    page, row_count = get_table_page(page_current, page_size, sort_by, filter_query, COLUMNS_FOR_DATA_TABLE, *args)
+    page_count = max(-(-row_count // page_size), 1)
+    return page, page_count, f'{row_count:,} rows'
+
+
+"""
+The callbacks below re-query the visible range at full detail (up to the point budget) when their graph is zoomed.
+"""
+
+
+def visible_range(graph_id, relayout_data):
+    """
+    Zoomed x range of a graph, only when its relayoutData triggered the callback (not when the filters changed)
+    """
+    triggered = [trigger['prop_id'] for trigger in dash.callback_context.triggered]
+    return zoom_range(relayout_data) if f'{graph_id}.relayoutData' in triggered else None
+
+
+def keep_zoom(fig, args):
+    """
+    Keeps the zoom of the user when a figure is re-emitted for the same filters, resets it when they change
+    """
+    fig.update_layout(uirevision=str(args))
+    return fig
+
+
+@app.callback(Output('time_series', 'figure'),
+              [Input('feature_selector', 'value'), Input('time_series', 'relayoutData'),
+               Input('signal_data_filtered', 'children')] + DATA_FILTERING_INPUTS)
+def update_time_series_figure(feature, relayout_data, *args):
+    if not args[0]:
+        raise PreventUpdate
+    x_range = visible_range('time_series', relayout_data)
+
+    def build():
+        data = get_plot_data(x_range, POINT_BUDGETS['figure'], *args)
+        # order book features are not aggregated in bars
+        if feature not in data:
+            data = get_feature_data(x_range, feature, *args)
+        return keep_zoom(FigureGenerator.figure(data, feature), args)
+
+    return cached_figure('time_series', build, args, feature=feature, x_range=x_range)
+
+
+@app.callback(Output('bid_ask', 'figure'),
+              [Input('bid_ask', 'relayoutData'), Input('signal_data_filtered', 'children')] + DATA_FILTERING_INPUTS)
+def update_bid_ask_figure(relayout_data, *args):
+    if not args[0]:
+        raise PreventUpdate
+    x_range = visible_range('bid_ask', relayout_data)
+    build = lambda: keep_zoom(
+        FigureGenerator.bid_ask_figure(get_plot_data(x_range, POINT_BUDGETS['bid_ask_figure'], *args)), args)
+    return cached_figure('bid_ask', build, args, x_range=x_range)
+
+
+@app.callback(Output('depth', 'figure'),
+              [Input('depth', 'relayoutData'), Input('signal_data_filtered', 'children')] + DATA_FILTERING_INPUTS)
+def update_depth_figure(relayout_data, *args):
+    if not args[0]:
+        raise PreventUpdate
+    x_range = visible_range('depth', relayout_data)
+    build = lambda: keep_zoom(FigureGenerator.depth_cum_figure(get_zoomed_data(x_range, *args)), args)
+    return cached_figure('depth', build, args, x_range=x_range)
 
 
 @app.callback(Output('depth_2', 'figure'),
-              [Input('color_scale', 'value'), Input('signal_data_filtered', 'children')] + DATA_FILTERING_INPUTS)
-def generate_trade_volume_figure(scale, *args):
+              [Input('color_scale', 'value'), Input('depth_2', 'relayoutData'),
+               Input('signal_data_filtered', 'children')] + DATA_FILTERING_INPUTS)
+def generate_trade_volume_figure(scale, relayout_data, *args):
     """
     Generates the trade volume figure from filtered data.
     Separate from main figure updater for quick load on color scale change
     """
-    df = get_filtered_data(*args)
-    fig = FigureGenerator.depth_non_cum_figure(df, scale)
-    return fig
+    if not args[0]:
+        raise PreventUpdate
+    x_range = visible_range('depth_2', relayout_data)
+
+    def build():
+        df, quotes = get_zoomed_data(x_range, *args), get_zoomed_data(x_range, *args, quotes=True)
+        return keep_zoom(FigureGenerator.depth_non_cum_figure(df, scale, quotes), args)
+
+    return cached_figure('depth_2', build, args, scale=scale, x_range=x_range)
+
+
+@app.callback(Output('book', 'figure'),
+              [Input('book', 'relayoutData'), Input('signal_data_filtered', 'children')] + DATA_FILTERING_INPUTS)
+def update_book_figure(relayout_data, *args):
+    """
+    Replays the full depth book of the selected msuk over the window, from its nearest checkpoint
+    """
+    if not args[0]:
+        raise PreventUpdate
+    x_range = visible_range('book', relayout_data)
+    build = lambda: keep_zoom(
+        FigureGenerator.book_figure(get_book_levels(x_range, BOOK_DEPTH, HEATMAP_BINS['time'], *args)), args)
+    return cached_figure('book', build, args, x_range=x_range)
 
 
 @app.callback(
@@ -77,10 +222,43 @@ def generate_trade_volume_details_figure(click_data_2, click_data_1, *args):
     Generates trade_volume_details figure on clicking the depth figures.
     Separate from main figure updater because of click & hover data inputs
     """
-    ctx = dash.callback_context
-    df = get_filtered_data(*args)
-    fig = FigureGenerator.trade_volume_detail(ctx, df)
-    return fig
+    if not args[0]:
+        raise PreventUpdate
+    # not cached: one figure per hovered point would evict the expensive figures from the cache
+    return FigureGenerator.trade_volume_detail(dash.callback_context, get_filtered_data(*args))
+
+
+"""
+The callbacks below follow a file being written: its new lines are appended to the open graphs on each tick of
+live_interval, the figures are not rebuilt.
+"""
+
+
+@app.callback(Output('live_interval', 'disabled'), [Input('live', 'on'), Input('file', 'value')])
+def set_live_interval(on, file_path):
+    return not (on and can_follow(file_path))
+
+
+@app.callback([Output('time_series', 'extendData'), Output('bid_ask', 'extendData'),
+               Output('size_imbalance', 'extendData')],
+              [Input('live_interval', 'n_intervals')],
+              [State('feature_selector', 'value'), State('signal_data_filtered', 'children')]
+              + DATA_FILTERING_STATES)
+def extend_live_figures(_, feature, *args):
+    """
+    Appends the entries written to the selected file since the last tick, within the filters, to the time graphs
+    """
+    new = follow(args[0], args[3]) if args[0] else None
+    quotes = filter_window(new.quotes, **args_to_hashable_kwargs(*args)) if new is not None else None
+    if quotes is None or not len(quotes):
+        raise PreventUpdate
+    app.logger.info(f"{len(new.df)} new entries in {args[0]}")
+    # order book features are computed over the whole file, the time series is rebuilt with them on its next update
+    time_series = FigureGenerator.extend_data(quotes, [feature], POINT_BUDGETS['figure']) if feature in quotes \
+        else dash.no_update
+    return (time_series,
+            FigureGenerator.extend_data(quotes, ['bidPx', 'askPx', 'bidSz', 'askSz'], POINT_BUDGETS['bid_ask_figure']),
+            FigureGenerator.extend_data(quotes, ['size_imbalance'], POINT_BUDGETS['size_imbalance_figure']))
 
 
 """
@@ -124,16 +302,34 @@ def set_micros_values(button, value):
               help="Use cache for data loading. Recommended for large datasets.")
 @click.option("--debug/--no-debug", "-d", is_flag=True, default=True,
               help="Run dash app in debug mode.")
-def main(use_cache, debug):
+@click.option("--warm-up", "-w", type=click.Choice(['none', 'cache', 'memory']), default='none',
+              help="Before the first request, parse all the data files to the disk cache (cache), or load them all in "
+                   "memory in the background (memory).")
+def main(use_cache, debug, warm_up):
     """
     Runs a server for displaying book data on a webpage.
     """
 
-    app.layout = generate_app_layout(FEATURES, DATA_FILES, use_cache)
+    catalog = scan_catalog()
+    app.logger.info(f" * Catalog of {len(catalog)} data files")
+    app.layout = generate_app_layout(FEATURES, catalog, use_cache)
     if debug:
         app.logger.setLevel(logging.INFO)
+        # logs of the utils modules, e.g. downsampling ratios
+        utils_logger = logging.getLogger('utils')
+        utils_logger.setLevel(logging.INFO)
+        utils_logger.addHandler(logging.StreamHandler())
 
     app.logger.info(f" * Data caching: {'on' if use_cache else 'off'}")
+    if use_cache:
+        removed = clean_cache()
+        app.logger.info(f" * Removed {len(removed)} stale cache entries")
+    if warm_up == 'cache':
+        failed = warm_up_cache(list(catalog))
+        app.logger.info(f" * Cached {len(catalog) - len(failed)} data files")
+    elif warm_up == 'memory':
+        for file in catalog:
+            load_in_background(file, use_cache)
     app.run_server(debug=debug)
 
 
@@ -1,12 +1,21 @@
 from datetime import datetime as dt
 
 import dash_core_components as dcc
+import dash_daq as daq
 import dash_html_components as html
 
-from utils import generate_slider, generate_datatable
+from utils import generate_slider, generate_datatable, TABLE_PAGE_SIZE, LIVE_INTERVAL
+from utils.catalog import file_options, msuk_options
 
 
-def generate_app_layout(features, files, use_cache):
+def generate_app_layout(features, catalog, use_cache):
+    """
+    :param features: options of the feature selector
+    :param catalog: catalog of the data files, see utils.catalog.scan_catalog, the first one is selected
+    :param use_cache: if using cached data to load from disk
+    """
+    file = next(iter(catalog), None)
+    entry = catalog.get(file, {})
     app_layout = html.Div([
         html.Div([
             html.Div(use_cache, id='use_cache', style={'display': 'none'}),
@@ -20,27 +29,34 @@ def generate_app_layout(features, files, use_cache):
             html.Hr(),
             dcc.Dropdown(
                 id='msuk_selector',
-                options=[],
+                options=msuk_options(entry),
                 value=None,
                 placeholder='Select msuk'
             ),
             html.Hr(),
             dcc.Dropdown(
                 id='file',
-                options=[{'label': file, 'value': file} for file in files],
-                value=files[0],
+                options=file_options(catalog),
+                value=file,
                 clearable=False,
             ),
+            # files are loaded in the background, the progress is polled until the selected file is loaded
+            dcc.Interval(id='loading_interval', interval=500, disabled=True),
+            html.Div([
+                html.Progress(id='loading_progress', max=100, value=0, style={'width': '100%'}),
+                html.Div(id='loading_status', className='rowcount'),
+            ]),
+            # new lines of a file being written are appended to the graphs, see utils.live
+            daq.BooleanSwitch(id='live', on=False, label='Follow file'),
+            dcc.Interval(id='live_interval', interval=LIVE_INTERVAL, disabled=True),
             html.Hr(),
             html.Div([
                 html.Div('Date to display: ',
                          style={'width': '30%', 'margin': 'auto'}),
                 dcc.DatePickerSingle(
                     id='date_picker',
-                    min_date_allowed=dt(2010, 8, 5),
-                    max_date_allowed=dt.today(),
-                    initial_visible_month=dt(2019, 8, 7),
-                    date=str(dt(2019, 8, 7)),
+                    **date_picker_bounds(entry),
+                    date=entry['dates'][0] if entry.get('dates') else str(dt(2019, 8, 7)),
                     persistence=True,
                     style={'width': '70%'}
                 )],
@@ -84,12 +100,24 @@ def generate_app_layout(features, files, use_cache):
                             ],
                             className='row rowgraph'),
                             dcc.Graph(id='depth_detail'),
-                            dcc.Graph(id='depth')
+                            dcc.Graph(id='depth'),
+                            dcc.Graph(id='book')
                         ])
             ]),
-            generate_datatable('table'),
+            generate_datatable('table', TABLE_PAGE_SIZE),
             ],
         className='eight columns')
     ],
     className='row flex-display')
-    return app_layout
\ No newline at end of file
+    return app_layout
+
+
+def date_picker_bounds(entry):
+    """
+    :param entry: description of a file in the catalog
+    :return: bounds and initial month of the date picker, from the dates present in the file when it is described
+    """
+    dates = entry.get('dates')
+    if not dates:
+        return dict(min_date_allowed=dt(2010, 8, 5), max_date_allowed=dt.today(), initial_visible_month=dt(2019, 8, 7))
+    return dict(min_date_allowed=dates[0], max_date_allowed=dates[-1], initial_visible_month=dates[0])
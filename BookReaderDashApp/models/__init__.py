@@ -1,3 +1,5 @@
 from .base import DataReader
 from .book_reader import BookReader
 from .top_book_reader import TopBookReader
+from .dataset import Dataset
+from .order_book import OrderBook
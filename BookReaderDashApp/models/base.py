@@ -1,4 +1,10 @@
 import abc
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
 
 
@@ -7,21 +13,43 @@ class DataReader(abc.ABC):
     Abstract data reader class. All subclasses must implement a `load` class method.
     """
 
+    # version of the loaded data, to bump whenever a change to .load alters its output.
+    _version = 8
+
     # required columns for the data after the .load of the subclasses.
     _required_columns = ("nanosEpoch", "bidPx", "bidSz", "askPx", "askSz", "tradePx", "tradeSz", "direction", "spread",
-                         "cumulative_trade_volume", "size_imbalance")
+                         "cumulative_trade_volume", "tradePct", "size_imbalance")
+
+    # calendar columns derived from `nanosEpoch` on demand, see .time_columns
+    _time_columns = ("date", "hour", "minute", "second", "microsecond", "time")
+
+    # low cardinality columns stored as categoricals.
+    _categorical_columns = ("msuk", "direction", "source")
+
+    # columns which can be downcast to 32 bits, see .downcast
+    _price_columns = ("tradePx", "bidPx", "cbidPx", "askPx", "caskPx", "spread", "tradePct")
+    _size_columns = ("tradeSz", "bidSz", "cbidSz", "askSz", "caskSz", "size_imbalance")
+
+    # file describing the columns of serialized data, stored next to the column files.
+    _schema_file = "schema.json"
+
+    # index of the rows of each msuk and date of serialized data, see .partitions
+    _index_file = "partitions.json"
 
     @classmethod
     @abc.abstractmethod
-    def load(cls, path):
+    def load(cls, path, progress=None):
         """
-        Load data.
+        Load data, sorted by `msuk` then `nanosEpoch`.
 
         Parameters
         ----------
         path : pathlib.Path or str
             path or path-like object pointing to the data file.
 
+        progress : callable, optional
+            called with the number of bytes of the file parsed since its previous call.
+
         Returns
         -------
         pandas.DataFrame
@@ -30,39 +58,249 @@ class DataReader(abc.ABC):
         pass
 
     @staticmethod
-    def serialize(df, path):
+    def serialize(df, path, metadata=None, validate=True):
         """
         Serialize to disk after validating the format.
 
+        The data is stored column by column in a directory, one .npy file per column next to a json schema. Numeric
+        columns are stored as little-endian arrays which can be memory mapped, string columns as fixed width unicode
+        arrays and categorical columns as their codes next to their categories. Calendar columns are not stored.
+        The directory is written aside and moved in place at the end, so readers never see a partial write.
+        Data sorted by `msuk` then `nanosEpoch` is partitioned by msuk and date: each partition is a contiguous range of
+        rows of the column files, listed in a small index file, so that one partition is read without the others.
+
         Parameters
         ----------
         df : pandas.DataFrame
             A dataframe of entries containing the required columns.
 
         path : pathlib.Path or str
-            path or path-like object pointing to where the data will be serialized.
+            path or path-like object pointing to the directory where the data will be serialized.
+
+        metadata : dict, optional
+            json serializable data stored in the schema, see .metadata
+
+        validate : bool
+            if true, check that the required columns of entries are present, false for other tables (e.g. bars).
         """
-        DataReader._validate(df)
-        pd.to_pickle(df, path)
+        if validate:
+            DataReader._validate(df)
+        path = Path(path)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tmp_path.mkdir(parents=True)
+
+        schema = {"rows": len(df), "columns": [], "metadata": metadata or {}}
+        for number, (column, values) in enumerate(df.items()):
+            if column in DataReader._time_columns:
+                continue
+            entry = {"name": column, "dtype": str(values.dtype), "file": f"{number}.npy"}
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                entry["categories"] = f"{number}.categories.npy"
+                DataReader._save_array(tmp_path.joinpath(entry["categories"]), values.cat.categories)
+                values = values.cat.codes
+            DataReader._save_array(tmp_path.joinpath(entry["file"]), values)
+            schema["columns"].append(entry)
+
+        with open(tmp_path.joinpath(DataReader._schema_file), mode="w") as f:
+            json.dump(schema, f)
+        if "msuk" in df.columns and "nanosEpoch" in df.columns:
+            with open(tmp_path.joinpath(DataReader._index_file), mode="w") as f:
+                json.dump({"partitions": DataReader._partition_rows(df)}, f)
+
+        shutil.rmtree(path, ignore_errors=True)
+        tmp_path.rename(path)
 
     @staticmethod
-    def deserialize(path):
+    def deserialize(path, columns=None, mmap=False, validate=True, rows=None):
         """
         De-serialize data committed to disk using .serialize
 
+        The schema is validated before any column is read, then each requested column file is read once. With `mmap`,
+        numeric columns are read-only memory maps of the column files wrapped without copy, so that all the processes
+        reading the same data share the OS page cache instead of holding private copies.
+
         Parameters
         ----------
         path : pathlib.Path or str
             path or path-like object pointing to the serialized data.
 
+        columns : iterable of str, optional
+            columns to read, all of them if None.
+
+        mmap : bool
+            if true, memory map numeric columns instead of reading them.
+
+        validate : bool
+            if true, check that the required columns of entries are stored, as for .serialize
+
+        rows : tuple of int, optional
+            start and stop positions of the rows to read, e.g. a partition (see .partitions), all of them if None.
+            Only the pages of these rows are read from the column files.
+
         Returns
         -------
         pandas.DataFrame
-            A dataframe of entries containing the required columns.
+            A dataframe of entries containing the required columns, or only the requested ones.
+
+        Raises
+        ------
+        RuntimeError
+            In case the stored data is missing required or requested columns.
+        """
+        path = Path(path)
+        with open(path.joinpath(DataReader._schema_file), mode="r") as f:
+            schema = json.load(f)
+
+        stored = [entry["name"] for entry in schema["columns"]]
+        if validate:
+            DataReader._validate_columns(stored)
+        if columns is None:
+            columns = stored
+        elif any(c not in stored for c in columns):
+            raise RuntimeError(f"Missing requested columns (one of {tuple(columns)}).")
+
+        if rows is not None and not 0 <= rows[0] <= rows[1] <= schema["rows"]:
+            raise RuntimeError(f"Rows {rows} out of the {schema['rows']} rows of the data.")
+
+        data = {}
+        for entry in schema["columns"]:
+            if entry["name"] not in columns:
+                continue
+            values = DataReader._load_array(path.joinpath(entry["file"]), mmap, rows, schema["rows"])
+            if rows is None and len(values) != schema["rows"]:
+                raise RuntimeError(f"Non conforming. Column `{entry['name']}` doesn't have {schema['rows']} rows.")
+            if "categories" in entry:
+                categories = DataReader._load_array(path.joinpath(entry["categories"]), False)
+                values = pd.Categorical.from_codes(values, categories)
+            data[entry["name"]] = values
+
+        return pd.DataFrame(data, copy=False)
+
+    @staticmethod
+    def _save_array(path, values):
+        """
+        Save a column as a .npy file, numeric arrays as little-endian and strings as fixed width unicode.
+
+        Parameters
+        ----------
+        path : pathlib.Path
+            .npy file to write.
+
+        values : pandas.Series or pandas.Index
+            column values.
+        """
+        if values.dtype.kind in "biufcmM":
+            array = values.to_numpy()
+            array = array.astype(array.dtype.newbyteorder("<"), copy=False)
+        else:
+            array = values.to_numpy(dtype=str)
+        np.save(path, array, allow_pickle=False)
+
+    @staticmethod
+    def _load_array(path, mmap, rows=None, length=None):
+        """
+        Load a column saved with ._save_array
+
+        Parameters
+        ----------
+        path : pathlib.Path
+            .npy file to read.
+
+        mmap : bool
+            if true, memory map numeric arrays instead of reading them.
+
+        rows : tuple of int, optional
+            start and stop positions of the rows to read, all of them if None.
+
+        length : int, optional
+            number of rows expected in the file when reading some of them.
+
+        Returns
+        -------
+        numpy.ndarray
+
+        Raises
+        ------
+        RuntimeError
+            In case the file doesn't have `length` rows.
+        """
+        # np.asarray drops the np.memmap subclass, keeping a plain ndarray view on the mapping
+        values = np.asarray(np.load(path, mmap_mode="r" if mmap or rows is not None else None, allow_pickle=False))
+        if rows is not None:
+            if length is not None and len(values) != length:
+                raise RuntimeError(f"Non conforming. Column file `{path.name}` doesn't have {length} rows.")
+            # only the rows read are copied out of the mapping
+            values = values[rows[0]:rows[1]] if mmap else np.array(values[rows[0]:rows[1]])
+        return values if values.dtype.kind != "U" else values.astype(object)
+
+    @staticmethod
+    def partitions(path):
+        """
+        Read the index of the partitions of data committed to disk using .serialize, without reading any column.
+
+        Parameters
+        ----------
+        path : pathlib.Path or str
+            path or path-like object pointing to the serialized data.
+
+        Returns
+        -------
+        dict or None
+            from (msuk, date) to the (start, stop) rows of the partition, dates as 'YYYY-MM-DD'. None if the data has no
+            index, e.g. serialized by a previous version.
+        """
+        try:
+            with open(Path(path).joinpath(DataReader._index_file), mode="r") as f:
+                return {(msuk, date): (start, stop) for msuk, date, start, stop in json.load(f)["partitions"]}
+        except (OSError, ValueError, KeyError):
+            return None
+
+    @staticmethod
+    def _partition_rows(df):
+        """
+        Rows of each msuk and date.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            A dataframe sorted by a categorical `msuk` then `nanosEpoch`.
+
+        Returns
+        -------
+        list of list
+            [msuk, date, start, stop] of each partition, in the order of the rows.
+        """
+        codes = df["msuk"].cat.codes.values
+        days = df["nanosEpoch"].values.astype("datetime64[ns]").astype("datetime64[D]")
+        new = np.ones(len(df), dtype=bool)
+        new[1:] = (codes[1:] != codes[:-1]) | (days[1:] != days[:-1])
+        starts = np.flatnonzero(new)
+        stops = np.append(starts[1:], len(df))
+        msuks = df["msuk"].cat.categories[codes[starts]]
+        return [[msuk.item() if hasattr(msuk, "item") else msuk, str(day), int(start), int(stop)]
+                for msuk, day, start, stop in zip(msuks, days[starts], starts, stops)]
+
+    @staticmethod
+    def metadata(path):
+        """
+        Read the metadata of data committed to disk using .serialize, without reading any column.
+
+        Parameters
+        ----------
+        path : pathlib.Path or str
+            path or path-like object pointing to the serialized data.
+
+        Returns
+        -------
+        dict or None
+            the metadata given to .serialize, None if there is no serialized data at `path`.
         """
-        df = pd.read_pickle(path)
-        DataReader._validate(df)
-        return pd.read_pickle(path)
+        try:
+            with open(Path(path).joinpath(DataReader._schema_file), mode="r") as f:
+                return json.load(f).get("metadata", {})
+        except (OSError, ValueError):
+            return None
 
     @staticmethod
     def _validate(df):
@@ -79,7 +317,107 @@ class DataReader(abc.ABC):
         RuntimeError
             In case one of the required columns is missing in the dataframe.
         """
+        DataReader._validate_columns(df.columns)
+
+    @staticmethod
+    def _validate_columns(columns):
+        """
+        Validate column names.
+
+        Parameters
+        ----------
+        columns : iterable
+            container of column names.
+
+        Raises
+        ------
+        RuntimeError
+            In case one of the required columns is missing.
+        """
         # fixme do we validate dtypes too?
-        if any(c not in df.columns for c in DataReader._required_columns):
+        if any(c not in columns for c in DataReader._required_columns):
             raise RuntimeError(f"Non conforming. Missing required columns (one of {DataReader._required_columns}).")
 
+    @staticmethod
+    def time_columns(df, columns=_time_columns):
+        """
+        Compute calendar columns from `nanosEpoch`, meant for the rows a view actually displays.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            A dataframe with a `nanosEpoch` column.
+
+        columns : iterable of str
+            calendar columns to compute, among `_time_columns`.
+
+        Returns
+        -------
+        pandas.DataFrame
+            the calendar columns, with the index of `df`.
+        """
+        datetime = pd.DatetimeIndex(df["nanosEpoch"].to_numpy(dtype="datetime64[ns]"))
+        return pd.DataFrame({column: getattr(datetime, column) for column in columns}, index=df.index)
+
+    @staticmethod
+    def downcast(df):
+        """
+        Downcast prices to float32 and sizes to int32 when they fit, in place.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            A dataframe of entries containing the required columns.
+        """
+        int32 = np.iinfo(np.int32)
+        for column in DataReader._price_columns:
+            if column in df.columns:
+                df[column] = df[column].astype("float32")
+        for column in DataReader._size_columns:
+            if column in df.columns and int32.min <= df[column].min() and df[column].max() <= int32.max:
+                df[column] = df[column].astype("int32")
+
+    @staticmethod
+    def _relative_prices(df):
+        """
+        Price of each trade relative to the best price of its side (bid for buys, ask for sells), the levels of the
+        cumulative depth, in place.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            A dataframe of entries containing `tradePx`, `bidPx`, `askPx` and `direction`.
+        """
+        best = np.where(df["direction"] == "Buy", df["bidPx"], df["askPx"])
+        df["tradePct"] = (df["tradePx"] / best).round(5)
+
+    @staticmethod
+    def _sort(df):
+        """
+        Stable sort by `msuk` then `nanosEpoch` in place, entries with the same timestamp keep their order.
+        Each msuk is then a contiguous range of rows sorted by time, see models.Dataset
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            A dataframe of entries containing the required columns and a categorical `msuk`.
+        """
+        msuk_steps = np.diff(df["msuk"].cat.codes.values)
+        time_steps = np.diff(df["nanosEpoch"].values)
+        if not np.all((msuk_steps > 0) | ((msuk_steps == 0) & (time_steps >= 0))):
+            # multi column sorts are stable
+            df.sort_values(["msuk", "nanosEpoch"], inplace=True, ignore_index=True)
+
+    @staticmethod
+    def _categorize(df):
+        """
+        Convert low cardinality columns to categoricals, in place.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            A dataframe of entries.
+        """
+        for column in DataReader._categorical_columns:
+            if column in df.columns:
+                df[column] = df[column].astype("category")
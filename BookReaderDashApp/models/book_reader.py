@@ -1,10 +1,28 @@
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 
+import numpy as np
 import pandas as pd
 
 from .base import DataReader
 
 
+class ParseError(RuntimeError):
+    """
+    Raised when an attribute of a data entry can't be parsed.
+    """
+
+    def __init__(self, attr, line_number):
+        # args are kept as is so that the exception pickles back from worker processes.
+        super().__init__(attr, line_number)
+        self.attr = attr
+        self.line_number = line_number
+
+    def __str__(self):
+        return f"Failed parsing attribute `{self.attr}` on line number `{self.line_number}`."
+
+
 class BookReader(DataReader):
     """
     DataReader for book line data.
@@ -16,22 +34,78 @@ class BookReader(DataReader):
         "datetime": re.compile(r"our=(\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?) (?:\w+) flags="),
         "trade": re.compile(r"(?:Buy|Sell) ([^\s]+)@([^\s]+)"),
         "direction" : re.compile(r"Buy|Sell"),
+        "level": re.compile(r"lvl=(\d+)"),
         "bid": re.compile(r"bid:([^\s]+)@([^\s]+)"),
         "cbid": re.compile(r"cbid:([^\s]+)@([^\s]+)"),
         "ask": re.compile(r"ask:([^\s]+)@([^\s]+)"),
         "cask": re.compile(r"cask:([^\s]+)@([^\s]+)"),
     }
 
+    # Single pattern matching a whole entry in its canonical field order, used by the fast parse path.
+    # Entries it doesn't match are handed to the per attribute regexes above.
+    _line_regex = re.compile(
+        r"\w+\((?P<msuk>\d+)\)"
+        r".*?(?P<direction>Buy|Sell) (?P<tradeSz>[^\s]+)@(?P<tradePx>[^\s]+)"
+        r"(?:.*?lvl=(?P<level>\d+))?"
+        r".*?our=(?P<datetime>\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?) (?:\w+) flags="
+        r".*?bid:(?P<bidSz>[^\s]+)@(?P<bidPx>[^\s]+)"
+        r".*?ask:(?P<askSz>[^\s]+)@(?P<askPx>[^\s]+)"
+        r".*?cbid:(?P<cbidSz>[^\s]+)@(?P<cbidPx>[^\s]+)"
+        r".*?cask:(?P<caskSz>[^\s]+)@(?P<caskPx>[^\s]+)"
+    )
+
+    # level of the entries without `lvl=`, the book is replayed by price so they load as the others.
+    _missing_level = -1
+
+    # dtypes of the parsed columns, in the column order of the loaded dataframe.
+    _parsed_dtypes = {
+        "msuk": "int64",
+        "datetime": "datetime64[ns]",
+        "direction": "object",
+        "tradeSz": "int64",
+        "tradePx": "float64",
+        "level": "int64",
+        "bidSz": "int64",
+        "bidPx": "float64",
+        "cbidSz": "int64",
+        "cbidPx": "float64",
+        "askSz": "int64",
+        "askPx": "float64",
+        "caskSz": "int64",
+        "caskPx": "float64",
+    }
+
+    # number of lines read and parsed at once by .load, bounds the memory used by the raw text.
+    _chunk_size = 100000
+
     @classmethod
-    def load(cls, path):
+    def load(cls, path, chunk_size=None, workers=None, progress=None, complete_lines=False):
         """
         Load data.
 
+        The file is streamed in chunks of lines, each parsed into typed column arrays. The chunks are concatenated once
+        at the end, so the raw text never sits in memory beyond one chunk. With several workers, the file is split into
+        newline aligned byte ranges parsed in a process pool.
+
         Parameters
         ----------
         path : pathlib.Path or str
             path or path-like object pointing to the data file.
 
+        chunk_size : int, optional
+            number of lines per chunk, defaults to `_chunk_size`.
+
+        workers : int, optional
+            number of processes parsing the file, parse in the current process if not greater than 1.
+
+        progress : callable, optional
+            called with the number of bytes parsed since its previous call, after each chunk (after each byte range
+            with several workers).
+
+        complete_lines : bool
+            if true, a last line without a newline is left out as it is still being written, e.g. when following a
+            growing file, see `.tail`. Otherwise it is parsed as the others.
+
         Returns
         -------
         pandas.DataFrame
@@ -42,43 +116,342 @@ class BookReader(DataReader):
         RuntimeError
             In case a parse operation is unsuccessful.
         """
-        with open(path, mode="r") as f:
-            lines = f.readlines()
-
-        # generator expression, (lazily) use once and throw away
-        data = (cls._parse_entry(line, number) for number, line in enumerate(lines, 1))
-
-        # let pandas do the type conversions
-        df = pd.DataFrame(data).astype({
-            "msuk": "int64",
-            "datetime": "datetime64[ns]",
-            "tradeSz": "int64",
-            "bidSz": "int64",
-            "askSz": "int64",
-            "cbidSz": "int64",
-            "caskSz": "int64",
-            "tradePx": "float64",
-            "bidPx": "float64",
-            "askPx": "float64",
-            "cbidPx": "float64",
-            "caskPx": "float64",
-            "direction": "str",
-            "spread": 'float64'
-        })
-
-        # compute remaining required columns
+        chunk_size = chunk_size or cls._chunk_size
+
+        if workers is not None and workers > 1:
+            chunks = cls._parse_parallel(path, chunk_size, workers, progress, complete_lines)
+        else:
+            chunks = cls._parse_range(path, 0, None, chunk_size, progress, complete_lines)
+
+        # groupby based columns are computed on the whole frame, they may span chunk boundaries
+        df = pd.DataFrame(cls._concatenate(chunks))
+        cls._derive_columns(df)
+        cls._sort(df)
+
+        return df
+
+    @classmethod
+    def tail(cls, path, offset, traded_volume=None):
+        """
+        Load the entries written to a growing file after a byte offset, e.g. a capture still being written.
+
+        Only complete lines are parsed, a line being written is left to the next call.
+
+        Parameters
+        ----------
+        path : pathlib.Path or str
+            path or path-like object pointing to the data file.
+
+        offset : int
+            byte offset of the first line not loaded yet, see `line_offset`.
+
+        traded_volume : callable, optional
+            called with the timestamps of the new entries, returns the volume already loaded at these timestamps as a
+            dict from (nanosEpoch, direction) to size, see models.Dataset.traded_volume. The cumulative trade volume
+            of the new entries continues from it.
+
+        Returns
+        -------
+        tuple
+            a dataframe of the new entries as returned by `.load`, and the byte offset of the next line to load.
+
+        Raises
+        ------
+        RuntimeError
+            In case a parse operation is unsuccessful, with the line number counted from `offset`.
+        """
+        with open(path, mode="rb") as f:
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+
+        df = pd.DataFrame(cls._parse_lines(data[:end].decode().split("\n")[:-1]))
+        cls._derive_columns(df, traded_volume)
+        cls._sort(df)
+
+        return df, offset + end
+
+    @classmethod
+    def _derive_columns(cls, df, traded_volume=None):
+        """
+        Compute the required columns from the parsed ones, in place. Calendar columns are computed on demand by
+        .time_columns
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            parsed entries, in file order.
+
+        traded_volume : callable, optional
+            volume already loaded at the timestamps of the entries, see `.tail`
+        """
+        cls._categorize(df)
+        df["spread"] = df["askPx"] - df["bidPx"]
         df["nanosEpoch"] = df["datetime"].values.astype("int64")
-        df['date'] = df['datetime'].dt.date
-        df['hour'] = df['datetime'].dt.hour
-        df['minute'] = df['datetime'].dt.minute
-        df['second'] = df['datetime'].dt.second
-        df['microsecond'] = df['datetime'].dt.microsecond
-        df['time'] = df['datetime'].dt.time
-        df['cumulative_trade_volume'] = df.groupby(['nanosEpoch', 'direction'])['tradeSz'].cumsum()
-        # TODO: comoute size imbalances for different levels
+        df['cumulative_trade_volume'] = df.groupby(['nanosEpoch', 'direction'], observed=True)['tradeSz'].cumsum()
+        if traded_volume is not None and len(df):
+            cls._continue_volume(df, traded_volume(np.unique(df["nanosEpoch"].values)))
+        cls._relative_prices(df)
+        # imbalances of the levels of the full depth book are order book features, see utils.features
         df['size_imbalance'] = df['askSz'] - df['bidSz']
 
-        return df
+    @staticmethod
+    def _continue_volume(df, volume):
+        """
+        Add the volume already loaded at the timestamps of new entries to their cumulative trade volume, in place.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            new entries, with `nanosEpoch`, `direction` and `cumulative_trade_volume`.
+
+        volume : dict
+            from (nanosEpoch, direction) to the size already loaded, usually only the last timestamp loaded.
+        """
+        if not volume:
+            return
+        nanos = df["nanosEpoch"].values
+        rows = np.flatnonzero(np.isin(nanos, [time for time, _ in volume]))
+        directions = df["direction"].values[rows]
+        carry = [volume.get((int(time), direction), 0) for time, direction in zip(nanos[rows], directions)]
+        column = df.columns.get_loc('cumulative_trade_volume')
+        df.iloc[rows, column] += np.array(carry, dtype=df['cumulative_trade_volume'].dtype)
+
+    @staticmethod
+    def line_offset(path, lines, block_size=1 << 20):
+        """
+        Byte offset of the line following a number of lines, e.g. of the first line not loaded yet.
+
+        Parameters
+        ----------
+        path : pathlib.Path or str
+            path or path-like object pointing to the data file.
+
+        lines : int
+            number of lines from the start of the file.
+
+        block_size : int
+            bytes read at once.
+
+        Returns
+        -------
+        int
+            byte offset, the size of the file if it has fewer complete lines.
+        """
+        offset = 0
+        with open(path, mode="rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                count = block.count(b"\n")
+                if count >= lines:
+                    position = -1
+                    for _ in range(lines):
+                        position = block.index(b"\n", position + 1)
+                    return offset + position + 1
+                lines -= count
+                offset += len(block)
+        return offset
+
+    @classmethod
+    def _parse_parallel(cls, path, chunk_size, workers, progress=None, complete_lines=False):
+        """
+        Parse a file in a process pool, one newline aligned byte range per task.
+
+        Parameters
+        ----------
+        path : pathlib.Path or str
+            path or path-like object pointing to the data file.
+
+        chunk_size : int
+            number of lines per chunk.
+
+        workers : int
+            number of processes.
+
+        progress : callable, optional
+            called with the size of each byte range once parsed.
+
+        complete_lines : bool
+            if true, a last line without a newline is left out.
+
+        Returns
+        -------
+        list of dict
+            parsed chunks in file order, as returned by `_parse_lines`.
+
+        Raises
+        ------
+        RuntimeError
+            In case a parse operation is unsuccessful, with the line number counted from the start of the file.
+        """
+        chunks = []
+        line_count = 0
+        ranges = cls._split_ranges(path, workers)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(cls._parse_range, path, start, end, chunk_size, None, complete_lines)
+                       for start, end in ranges]
+            # results are collected in file order, so the lines of all previous ranges are known on failure
+            for future, (start, end) in zip(futures, ranges):
+                try:
+                    range_chunks = future.result()
+                except ParseError as e:
+                    for pending in futures:
+                        pending.cancel()
+                    raise ParseError(e.attr, e.line_number + line_count) from None
+                chunks.extend(range_chunks)
+                line_count += sum(len(chunk["msuk"]) for chunk in range_chunks)
+                if progress is not None:
+                    progress(end - start)
+        return chunks
+
+    @staticmethod
+    def _split_ranges(path, parts):
+        """
+        Split a file into contiguous byte ranges starting at the beginning of a line.
+
+        Parameters
+        ----------
+        path : pathlib.Path or str
+            path or path-like object pointing to the data file.
+
+        parts : int
+            maximum number of ranges.
+
+        Returns
+        -------
+        list of tuple
+            (start, end) byte offsets, end excluded.
+        """
+        size = os.path.getsize(path)
+        offsets = [0]
+        with open(path, mode="rb") as f:
+            for part in range(1, parts):
+                f.seek(max(size * part // parts - 1, offsets[-1]))
+                f.readline()
+                offset = f.tell()
+                if offset >= size:
+                    break
+                if offset > offsets[-1]:
+                    offsets.append(offset)
+        return list(zip(offsets, offsets[1:] + [size]))
+
+    @classmethod
+    def _parse_range(cls, path, start, end, chunk_size, progress=None, complete_lines=False):
+        """
+        Parse the lines of a byte range of a file, chunk by chunk.
+
+        Parameters
+        ----------
+        path : pathlib.Path or str
+            path or path-like object pointing to the data file.
+
+        start : int
+            byte offset of the first line.
+
+        end : int or None
+            byte offset where parsing stops, at the end of the file if None.
+
+        chunk_size : int
+            number of lines per chunk.
+
+        progress : callable, optional
+            called with the number of bytes of each chunk once parsed.
+
+        complete_lines : bool
+            if true, a last line without a newline is left out.
+
+        Returns
+        -------
+        list of dict
+            parsed chunks, as returned by `_parse_lines`.
+
+        Raises
+        ------
+        RuntimeError
+            In case a parse operation is unsuccessful, with the line number counted from `start`.
+        """
+        chunks = []
+        lines = []
+        line_number = 1
+        position = chunk_start = start
+        with open(path, mode="rb") as f:
+            f.seek(start)
+            for line in f:
+                if end is not None and position >= end or complete_lines and not line.endswith(b"\n"):
+                    break
+                position += len(line)
+                lines.append(line.decode())
+                if len(lines) == chunk_size:
+                    chunks.append(cls._parse_lines(lines, line_number))
+                    line_number += len(lines)
+                    lines = []
+                    if progress is not None:
+                        progress(position - chunk_start)
+                    chunk_start = position
+        if lines:
+            chunks.append(cls._parse_lines(lines, line_number))
+        if progress is not None and position > chunk_start:
+            progress(position - chunk_start)
+        return chunks
+
+    @classmethod
+    def _concatenate(cls, chunks):
+        """
+        Concatenate parsed chunks column by column, releasing each chunk column once it is copied.
+
+        Parameters
+        ----------
+        chunks : list of dict
+            from column name to numpy.ndarray, as returned by `_parse_lines`. Emptied by the call.
+
+        Returns
+        -------
+        dict
+            from column name to numpy.ndarray.
+        """
+        if not chunks:
+            return cls._parse_lines([])
+        return {column: np.concatenate([chunk.pop(column) for chunk in chunks]) for column in cls._parsed_dtypes}
+
+    @classmethod
+    def _parse_lines(cls, lines, first_line_number=1):
+        """
+        Parse a block of data entries in a single pass, straight into typed columns.
+
+        Each entry is matched once against the combined line regex. Entries which don't follow the canonical field
+        order go through `_parse_entry`, which also reports the failing attribute and line number.
+
+        Parameters
+        ----------
+        lines : iterable of str
+            data entries.
+
+        first_line_number : int
+            line number of the first data entry.
+
+        Returns
+        -------
+        dict
+            from column name to numpy.ndarray, with the dtypes of `_parsed_dtypes`.
+
+        Raises
+        ------
+        RuntimeError
+            In case a parse operation is unsuccessful.
+        """
+        fields = sorted(cls._line_regex.groupindex, key=cls._line_regex.groupindex.get)
+        search = cls._line_regex.search
+
+        rows = []
+        for number, line in enumerate(lines, first_line_number):
+            match = search(line)
+            if match is not None:
+                rows.append(match.groups(str(cls._missing_level)))
+            else:
+                entry = cls._parse_entry(line, number)
+                rows.append(tuple(str(entry[field]) for field in fields))
+
+        values = dict(zip(fields, zip(*rows))) if rows else dict.fromkeys(fields, ())
+        return {column: np.array(values[column], dtype=dtype) for column, dtype in cls._parsed_dtypes.items()}
 
     @classmethod
     def _parse_entry(cls, line, line_number):
@@ -117,6 +490,10 @@ class BookReader(DataReader):
         match = cls._unsafe_search(line, line_number, "direction")
         data_dict["direction"] = match.group(0)
 
+        # parsing the level of the update, optional
+        match = cls._compiled_regexes["level"].search(line)
+        data_dict["level"] = match.group(1) if match is not None else str(cls._missing_level)
+
         # parsing price and trade data
         for attr in ("trade", "bid", "cbid", "ask", "cask"):
             match = cls._unsafe_search(line, line_number, attr)
@@ -155,5 +532,5 @@ class BookReader(DataReader):
         """
         match_result = cls._compiled_regexes[attr].search(line)
         if match_result is None:
-            raise RuntimeError(f"Failed parsing attribute `{attr}` on line number `{line_number}`.")
+            raise ParseError(attr, line_number)
         return match_result
@@ -0,0 +1,390 @@
+import numpy as np
+import pandas as pd
+
+
+class Dataset:
+    """
+    Loaded data with its indexes.
+
+    The data is sorted by msuk then time (see DataReader._sort), so that each msuk is a contiguous range of rows and
+    any time window of an msuk is found by binary search.
+    The best quotes of the book updates, shared by the entries of an update, are kept in a Dataset of their own.
+    """
+
+    # quote fields of the best quotes table, see .best_quotes
+    _quote_columns = ("nanosEpoch", "datetime", "msuk", "bidPx", "bidSz", "askPx", "askSz", "cbidPx", "cbidSz",
+                      "caskPx", "caskSz", "spread", "size_imbalance")
+
+    def __init__(self, df, quotes=True):
+        """
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            A dataframe of entries as returned by the readers, sorted by `msuk` then `nanosEpoch`.
+
+        quotes : bool
+            build the best quotes table of the entries as `.quotes`, a Dataset, None otherwise.
+        """
+        self.df = df
+        self.msuk_index = self._build_msuk_index(df)
+        self.quotes = Dataset(self.best_quotes(df), quotes=False) if quotes else None
+        # rows of all the msuks sorted by time, built by the first window over all of them, see .time_order
+        self._time_order = None
+
+    @classmethod
+    def best_quotes(cls, df):
+        """
+        Best quotes table: one row per book update (msuk and timestamp) with the quote fields only, and the row range
+        of the update in df.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            A dataframe of entries sorted by a categorical `msuk` then `nanosEpoch`.
+
+        Returns
+        -------
+        pandas.DataFrame
+            quotes sorted as df, with `row`, the position of the first entry of the update in df, and `row_count`, its
+            number of entries.
+        """
+        codes, times = df["msuk"].cat.codes.values, df["nanosEpoch"].values
+        updates = np.ones(len(df), dtype=bool)
+        updates[1:] = (codes[1:] != codes[:-1]) | (times[1:] != times[:-1])
+        rows = np.flatnonzero(updates)
+
+        quotes = df.iloc[rows][[column for column in cls._quote_columns if column in df.columns]]
+        quotes = quotes.reset_index(drop=True)
+        quotes["row"] = rows
+        quotes["row_count"] = np.diff(np.append(rows, len(df)))
+        return quotes
+
+    def extend(self, df):
+        """
+        Dataset with new entries appended, e.g. the lines written to a capture since it was loaded.
+
+        The new entries are merged into the rows, after the loaded entries of the same msuk and timestamp, and their
+        book updates into the best quotes: neither is sorted or rebuilt.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            A dataframe of new entries as returned by the readers, sorted by `msuk` then `nanosEpoch`.
+
+        Returns
+        -------
+        Dataset
+            a new dataset, this one is left unchanged for the callbacks still using it.
+        """
+        if not len(df):
+            return self
+        loaded = len(self.df)
+        # the new columns take the dtypes of the loaded ones, e.g. downcast ones
+        df = df[self.df.columns].astype({column: dtype for column, dtype in self.df.dtypes.items()
+                                         if not isinstance(dtype, pd.CategoricalDtype)})
+        appended = self._concat([self.df, df])
+        codes, times = appended["msuk"].cat.codes.values, appended["nanosEpoch"].values
+        positions = self._merge_positions(codes[:loaded], times[:loaded], codes[loaded:], times[loaded:])
+        order = np.insert(np.arange(loaded), positions, np.arange(loaded, len(appended)))
+
+        # entries appended after the last msuk are already in order
+        combined = appended.take(order) if positions[0] < loaded else appended
+        combined.index = pd.RangeIndex(len(combined))
+        dataset = Dataset(combined, quotes=False)
+        if self.quotes is not None:
+            quotes = self._merge_quotes(self.quotes.df, self.best_quotes(appended.iloc[loaded:]), positions, order,
+                                        codes, times)
+            dataset.quotes = Dataset(quotes, quotes=False)
+        return dataset
+
+    @staticmethod
+    def _merge_positions(codes, times, new_codes, new_times):
+        """
+        Positions where sorted new entries are inserted among sorted loaded ones, after the loaded entries of the same
+        msuk and timestamp.
+
+        Parameters
+        ----------
+        codes, times : numpy.ndarray
+            msuk codes and nanosEpoch of the loaded entries, sorted by code then time.
+
+        new_codes, new_times : numpy.ndarray
+            msuk codes and nanosEpoch of the new entries, sorted by code then time.
+
+        Returns
+        -------
+        numpy.ndarray
+            non decreasing row positions in the loaded entries, as taken by numpy.insert
+        """
+        positions = np.empty(len(new_codes), dtype=np.int64)
+        for code in np.unique(new_codes):
+            first, last = np.searchsorted(new_codes, [code, code + 1])
+            start, stop = np.searchsorted(codes, [code, code + 1])
+            positions[first:last] = start + np.searchsorted(times[start:stop], new_times[first:last], side="right")
+        return positions
+
+    @staticmethod
+    def _merge_quotes(quotes, new_quotes, positions, order, codes, times):
+        """
+        Merge the best quotes of new entries into the best quotes of the loaded ones, see .extend
+
+        Parameters
+        ----------
+        quotes : pandas.DataFrame
+            best quotes of the loaded entries.
+
+        new_quotes : pandas.DataFrame
+            best quotes of the new entries, their rows counted from the first new entry.
+
+        positions : numpy.ndarray
+            positions of the new entries among the loaded ones, see ._merge_positions
+
+        order : numpy.ndarray
+            rows of the loaded then new entries, in their merged order.
+
+        codes, times : numpy.ndarray
+            msuk codes and nanosEpoch of the loaded then new entries.
+
+        Returns
+        -------
+        pandas.DataFrame
+            the best quotes of the merged entries, as returned by .best_quotes
+        """
+        loaded = len(order) - len(positions)
+        rows = quotes["row"].values
+        row_counts = quotes["row_count"].values.copy()
+
+        new_rows = new_quotes["row"].values
+        merged_rows = positions[new_rows] + new_rows
+        # an update continues a loaded one when the entry merged before its first entry is loaded with the same key
+        previous = order[np.maximum(merged_rows - 1, 0)]
+        continued = (merged_rows > 0) & (previous < loaded) & (codes[previous] == codes[loaded + new_rows]) & \
+                    (times[previous] == times[loaded + new_rows])
+        updated = np.searchsorted(rows, previous[continued], side="right") - 1
+        np.add.at(row_counts, updated, new_quotes["row_count"].values[continued])
+
+        rows = rows + np.searchsorted(positions, rows, side="right")
+        inserted = ~continued
+        merged = Dataset._concat([quotes, new_quotes[inserted]])
+        merged["row"] = np.concatenate([rows, merged_rows[inserted]])
+        merged["row_count"] = np.concatenate([row_counts, new_quotes["row_count"].values[inserted]])
+        merged = merged.take(np.insert(np.arange(len(rows)), np.searchsorted(rows, merged_rows[inserted]),
+                                       np.arange(len(rows), len(merged))))
+        merged.index = pd.RangeIndex(len(merged))
+        return merged
+
+    def traded_volume(self, times):
+        """
+        Volume traded at some timestamps by direction, over all the msuks, by binary search.
+
+        Parameters
+        ----------
+        times : numpy.ndarray
+            sorted unique nanosEpoch.
+
+        Returns
+        -------
+        dict
+            from (nanosEpoch, direction) to the sum of `tradeSz`, for the timestamps present only.
+        """
+        volume = {}
+        for start, stop in self.msuk_index.values():
+            partition = self.df.iloc[start:stop]
+            partition_times = partition["nanosEpoch"].values
+            positions = np.minimum(np.searchsorted(partition_times, times), len(partition_times) - 1)
+            for time in times[partition_times[positions] == times]:
+                rows = self.time_slice(partition, time, time + 1)
+                for direction, size in zip(rows["direction"], rows["tradeSz"]):
+                    volume[(int(time), direction)] = volume.get((int(time), direction), 0) + int(size)
+        return volume
+
+    @staticmethod
+    def _concat(frames):
+        """
+        Concatenate dataframes with the same columns, categorical columns stay categorical.
+
+        Parameters
+        ----------
+        frames : list of pandas.DataFrame
+
+        Returns
+        -------
+        pandas.DataFrame
+            with a default index.
+        """
+        frames = list(frames)
+        for column, dtype in frames[0].dtypes.items():
+            if isinstance(dtype, pd.CategoricalDtype):
+                categories = frames[0][column].cat.categories
+                for frame in frames[1:]:
+                    categories = categories.union(frame[column].cat.categories)
+                for number, frame in enumerate(frames):
+                    if not frame[column].cat.categories.equals(categories):
+                        frames[number] = frame.copy(deep=False)
+                        frames[number][column] = frame[column].cat.set_categories(categories)
+        return pd.concat(frames, ignore_index=True)
+
+    @staticmethod
+    def _build_msuk_index(df):
+        """
+        Row range of each msuk.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            A dataframe of entries sorted by a categorical `msuk`.
+
+        Returns
+        -------
+        dict
+            from msuk to a (start, stop) tuple of row positions, in the order of the rows.
+        """
+        codes = df["msuk"].cat.codes.values
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(codes)) + 1]) if len(codes) else np.array([], dtype=int)
+        stops = np.append(starts[1:], len(codes))
+        categories = df["msuk"].cat.categories.tolist()
+        return {categories[codes[start]]: (int(start), int(stop)) for start, stop in zip(starts, stops)}
+
+    def memory_usage(self, deep=False):
+        """
+        Bytes used by the data, its indexes and its best quotes.
+
+        Parameters
+        ----------
+        deep : bool
+            passed to pandas.DataFrame.memory_usage, introspect object columns.
+
+        Returns
+        -------
+        int
+        """
+        quotes = self.quotes.memory_usage(deep) if self.quotes is not None else 0
+        time_order = sum(array.nbytes for array in self._time_order) if self._time_order is not None else 0
+        return int(self.df.memory_usage(deep=deep).sum()) + quotes + time_order
+
+    def msuk_options(self):
+        """
+        Dropdown options for the msuks of the dataset, with their number of rows.
+
+        Returns
+        -------
+        list of dict
+        """
+        return [{'label': f'{msuk} ({stop - start:,} rows)', 'value': msuk}
+                for msuk, (start, stop) in self.msuk_index.items()]
+
+    def partition(self, msuk):
+        """
+        Rows of one msuk, in constant time.
+
+        Parameters
+        ----------
+        msuk : int or str
+            instrument identifier.
+
+        Returns
+        -------
+        pandas.DataFrame
+            a zero-copy slice of the data, sorted by time, empty if the msuk is unknown.
+        """
+        start, stop = self.msuk_index.get(msuk, (0, 0))
+        return self.df.iloc[start:stop]
+
+    def window(self, start, end, msuk=None):
+        """
+        Rows within a time window.
+
+        Parameters
+        ----------
+        start : int
+            first nanosEpoch of the window.
+
+        end : int
+            nanosEpoch at the end of the window, excluded.
+
+        msuk : int or str, optional
+            instrument identifier, all of them if None.
+
+        Returns
+        -------
+        pandas.DataFrame
+            rows sorted by time. A zero-copy slice when a single msuk is selected or present, the rows of the window
+            taken through `.time_order` otherwise.
+        """
+        if msuk is not None or len(self.msuk_index) <= 1:
+            partition = self.partition(msuk) if msuk is not None else self.df
+            return self.time_slice(partition, start, end)
+
+        order, times = self.time_order()
+        first, last = np.searchsorted(times, [start, end], side="left")
+        return self.df.take(order[first:last])
+
+    def time_order(self):
+        """
+        Rows of all the msuks sorted by time, computed once per dataset.
+
+        Returns
+        -------
+        tuple of numpy.ndarray
+            the row positions sorted by `nanosEpoch`, by msuk within a timestamp, and their sorted `nanosEpoch`.
+        """
+        if self._time_order is None:
+            times = self.df["nanosEpoch"].values
+            order = np.argsort(times, kind="stable")
+            self._time_order = order, times[order]
+        return self._time_order
+
+    @staticmethod
+    def time_slice(df, start, end):
+        """
+        Rows of a dataframe sorted by time within a time window, by binary search.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            A dataframe sorted by `nanosEpoch`.
+
+        start : int
+            first nanosEpoch of the window.
+
+        end : int
+            nanosEpoch at the end of the window, excluded.
+
+        Returns
+        -------
+        pandas.DataFrame
+            a zero-copy slice of df.
+        """
+        first, last = np.searchsorted(df["nanosEpoch"].values, [start, end], side="left")
+        return df.iloc[first:last]
+
+    @staticmethod
+    def time_rows(df, nanos, tolerance=0):
+        """
+        Rows at the timestamp nearest to a time, by binary search: the sorted `nanosEpoch` is the timestamp index.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            A dataframe sorted by `nanosEpoch`.
+
+        nanos : int
+            nanosEpoch looked up.
+
+        tolerance : int
+            maximum distance in nanoseconds to the nearest timestamp, e.g. for times rounded by the browser.
+
+        Returns
+        -------
+        pandas.DataFrame
+            a zero-copy slice of df, empty if no timestamp is within the tolerance.
+        """
+        times = df["nanosEpoch"].values
+        position = np.searchsorted(times, nanos)
+        candidates = [candidate for candidate in (position - 1, position) if 0 <= candidate < len(times)]
+        if not candidates:
+            return df.iloc[:0]
+        nearest = times[min(candidates, key=lambda candidate: abs(int(times[candidate]) - nanos))]
+        if abs(int(nearest) - nanos) > tolerance:
+            return df.iloc[:0]
+        return Dataset.time_slice(df, nearest, nearest + 1)
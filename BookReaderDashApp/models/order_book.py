@@ -0,0 +1,267 @@
+import numpy as np
+import pandas as pd
+
+
+class OrderBook:
+    """
+    Full depth book of one msuk, replayed from its level updates.
+
+    Each update of line data sets the size resting at a price on one side of the book (the `qty@price` of a Modify
+    line, bid for Buy and ask for Sell), a null size removing the price level. The book is held in one array of sizes
+    indexed by side and distinct price, so that applying updates is a vectorized assignment.
+    The book is checkpointed every `_checkpoint_interval` updates, the book at any time is rebuilt from the nearest
+    checkpoint before it by replaying only the updates after the checkpoint.
+    """
+
+    # number of updates between two checkpoints, bounds the updates replayed to rebuild the book at any time
+    _checkpoint_interval = 10000
+
+    # number of updates replayed at once by .levels_after, bounds the levels which can reach the best ones in a chunk
+    _chunk_updates = 64
+
+    def __init__(self, df, checkpoint_interval=None):
+        """
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            level updates of one msuk sorted by time, with `nanosEpoch`, `direction`, `tradePx` and `tradeSz`, e.g.
+            a partition of a models.Dataset of line data.
+
+        checkpoint_interval : int, optional
+            number of updates between two checkpoints, defaults to `_checkpoint_interval`.
+        """
+        self.interval = checkpoint_interval or self._checkpoint_interval
+        self.times = df["nanosEpoch"].values
+        self.prices = np.unique(df["tradePx"].values)
+        # position of each update in the array of the book: bids first, then asks, by increasing price
+        asks = np.asarray(df["direction"].values == "Sell")
+        self.cells = asks * len(self.prices) + np.searchsorted(self.prices, df["tradePx"].values)
+        self.sizes = df["tradeSz"].values
+        self.checkpoints = self._build_checkpoints()
+
+    def _build_checkpoints(self):
+        """
+        Replay all the updates once, keeping the non-empty levels of the book every `interval` updates.
+
+        Returns
+        -------
+        list of tuple
+            the cells and sizes of the non-empty levels of the book after 0, interval, 2 * interval... updates.
+        """
+        book = self._empty_book()
+        checkpoints = [(np.array([], dtype=np.int64), book[:0])]
+        for start in range(0, len(self.cells), self.interval):
+            self._replay(book, start, min(start + self.interval, len(self.cells)))
+            cells = np.flatnonzero(book)
+            checkpoints.append((cells, book[cells]))
+        return checkpoints
+
+    def _empty_book(self):
+        return np.zeros(2 * len(self.prices), dtype=self.sizes.dtype)
+
+    def _replay(self, book, start, stop):
+        """
+        Apply updates to a book in place, the last update of each level wins.
+
+        Parameters
+        ----------
+        book : numpy.ndarray
+            sizes of the book after `start` updates.
+
+        start, stop : int
+            range of the updates to apply.
+        """
+        if stop <= start:
+            return
+        cells = self.cells[start:stop][::-1]
+        cells, last = np.unique(cells, return_index=True)
+        book[cells] = self.sizes[start:stop][::-1][last]
+
+    def _book_after(self, count, book=None, position=0):
+        """
+        Book after a number of updates, from the nearest checkpoint or from a book already replayed up to a position.
+
+        Parameters
+        ----------
+        count : int
+            number of updates applied.
+
+        book : numpy.ndarray, optional
+            sizes of a book after `position` updates, updated in place when replaying from it is shorter.
+
+        position : int
+            number of updates applied to `book`.
+
+        Returns
+        -------
+        numpy.ndarray
+            sizes of the book.
+        """
+        checkpoint = count // self.interval
+        if book is None or position > count or checkpoint * self.interval > position:
+            book = self._empty_book()
+            cells, sizes = self.checkpoints[checkpoint]
+            book[cells] = sizes
+            position = checkpoint * self.interval
+        self._replay(book, position, count)
+        return book
+
+    def snapshot(self, nanos):
+        """
+        Full book at a time, rebuilt from the nearest checkpoint.
+
+        Parameters
+        ----------
+        nanos : int
+            nanosEpoch, updates at this time included.
+
+        Returns
+        -------
+        pandas.DataFrame
+            one row per non-empty level with `direction` ('Buy' for bids, 'Sell' for asks), `price` and `size`, bids by
+            decreasing price then asks by increasing price.
+        """
+        book = self._book_after(np.searchsorted(self.times, nanos, side="right"))
+        bids, asks = np.flatnonzero(book[:len(self.prices)])[::-1], np.flatnonzero(book[len(self.prices):])
+        return pd.DataFrame({"direction": ["Buy"] * len(bids) + ["Sell"] * len(asks),
+                             "price": np.concatenate([self.prices[bids], self.prices[asks]]),
+                             "size": np.concatenate([book[bids], book[len(self.prices) + asks]])})
+
+    def levels(self, times, depth):
+        """
+        Best levels of the book at many times, replaying the updates of the whole window in one pass.
+
+        Parameters
+        ----------
+        times : numpy.ndarray
+            sorted nanosEpoch, updates at these times included.
+
+        depth : int
+            number of levels on each side.
+
+        Returns
+        -------
+        dict
+            from `bidPx`, `bidSz`, `askPx` and `askSz` to arrays of times × levels, from the best level. Missing levels
+            have a NaN price and a null size.
+        """
+        shape = (len(times), depth)
+        levels = {"bidPx": np.full(shape, np.nan), "bidSz": np.zeros(shape, dtype=self.sizes.dtype),
+                  "askPx": np.full(shape, np.nan), "askSz": np.zeros(shape, dtype=self.sizes.dtype)}
+        book, position = None, 0
+        for number, count in enumerate(np.searchsorted(self.times, times, side="right")):
+            book, position = self._book_after(count, book, position), count
+            bids = np.flatnonzero(book[:len(self.prices)])[::-1][:depth]
+            asks = np.flatnonzero(book[len(self.prices):])[:depth]
+            levels["bidPx"][number, :len(bids)], levels["bidSz"][number, :len(bids)] = self.prices[bids], book[bids]
+            levels["askPx"][number, :len(asks)] = self.prices[asks]
+            levels["askSz"][number, :len(asks)] = book[len(self.prices) + asks]
+        return levels
+
+    def levels_after(self, counts, depth):
+        """
+        Best levels of the book after many numbers of updates, e.g. after each book update of the whole data.
+
+        The updates are replayed by chunks of `_chunk_updates`. Within a chunk, only the levels which can be among the
+        best ones are followed: the best levels of the book at the start of the chunk, as many more as updates in the
+        chunk, and the updated levels. Their sizes after each update are forward filled as a matrix of updates × levels,
+        instead of reading a whole book after each update.
+
+        Parameters
+        ----------
+        counts : numpy.ndarray
+            sorted numbers of updates applied.
+
+        depth : int
+            number of levels on each side.
+
+        Returns
+        -------
+        dict
+            from `bidPx`, `bidSz`, `askPx` and `askSz` to arrays of counts × levels, as returned by .levels
+        """
+        shape = (len(counts), depth)
+        levels = {"bidPx": np.full(shape, np.nan), "bidSz": np.zeros(shape, dtype=self.sizes.dtype),
+                  "askPx": np.full(shape, np.nan), "askSz": np.zeros(shape, dtype=self.sizes.dtype)}
+        # position of the last update applied for each count, levels are read after it
+        last = np.asarray(counts) - 1
+        book, replayed = self._empty_book(), 0
+        for start in range(0, len(self.cells), self._chunk_updates):
+            stop = min(start + self._chunk_updates, len(self.cells))
+            first, end = np.searchsorted(last, [start, stop])
+            if first == end:
+                continue
+            self._replay(book, replayed, start)
+            replayed = start
+            for side, prefix in enumerate(("bid", "ask")):
+                prices, sizes = self._chunk_levels(book, side, start, stop, last[first:end] - start, depth)
+                levels[f"{prefix}Px"][first:end], levels[f"{prefix}Sz"][first:end] = prices, sizes
+        return levels
+
+    def _chunk_levels(self, book, side, start, stop, rows, depth):
+        """
+        Best levels of one side of the book after some updates of a chunk, see .levels_after
+
+        Parameters
+        ----------
+        book : numpy.ndarray
+            sizes of the book after `start` updates.
+
+        side : int
+            0 for bids, 1 for asks.
+
+        start, stop : int
+            range of the updates of the chunk.
+
+        rows : numpy.ndarray
+            positions in the chunk of the updates after which the levels are read.
+
+        depth : int
+            number of levels.
+
+        Returns
+        -------
+        tuple
+            prices and sizes, arrays of rows × levels.
+        """
+        count = len(self.prices)
+        side_book = book[side * count:(side + 1) * count]
+        cells = self.cells[start:stop]
+        updates = np.flatnonzero((cells >= count) == bool(side))
+        updated = cells[updates] - side * count
+
+        # levels by increasing price, the best ones are the last bids and the first asks
+        present = np.flatnonzero(side_book)
+        best = present[:depth + len(updates)] if side else present[::-1][:depth + len(updates)]
+        candidates = np.union1d(best, updated)
+        if not side:
+            candidates = candidates[::-1]
+        columns = np.searchsorted(candidates, updated) if side else \
+            len(candidates) - 1 - np.searchsorted(candidates[::-1], updated)
+
+        # 1 + the position of the last update of each level after each update of the chunk, 0 for the start of the chunk
+        latest = np.zeros((stop - start + 1, len(candidates)), dtype=np.int64)
+        latest[updates + 1, columns] = updates + 1
+        latest = np.maximum.accumulate(latest, axis=0)[rows + 1]
+        chunk_sizes = self.sizes[start:stop]
+        sizes = np.where(latest > 0, chunk_sizes[np.maximum(latest - 1, 0)], side_book[candidates])
+
+        shape = (len(rows), depth)
+        prices, level_sizes = np.full(shape, np.nan), np.zeros(shape, dtype=self.sizes.dtype)
+        ranks = np.cumsum(sizes > 0, axis=1)
+        row, column = np.nonzero((sizes > 0) & (ranks <= depth))
+        prices[row, ranks[row, column] - 1] = self.prices[candidates[column]]
+        level_sizes[row, ranks[row, column] - 1] = sizes[row, column]
+        return prices, level_sizes
+
+    def memory_usage(self, deep=False):
+        """
+        Bytes used by the updates and the checkpoints.
+
+        Returns
+        -------
+        int
+        """
+        arrays = [self.times, self.prices, self.cells, self.sizes] + [array for checkpoint in self.checkpoints
+                                                                       for array in checkpoint]
+        return sum(array.nbytes for array in arrays)
@@ -1,3 +1,5 @@
+import os
+
 import pandas as pd
 
 from .base import DataReader
@@ -15,7 +17,7 @@ class TopBookReader(DataReader):
     _size_to_unit = {10: 's', 13: 'ms', 16: 'us', 19: 'ns'}
 
     @classmethod
-    def load(cls, path):
+    def load(cls, path, progress=None):
         """
         Load data.
 
@@ -24,6 +26,9 @@ class TopBookReader(DataReader):
         path : pathlib.Path or str
             path or path-like object pointing to the data file.
 
+        progress : callable, optional
+            called with the size of the file once read.
+
         Returns
         -------
         pandas.DataFrame
@@ -34,6 +39,8 @@ class TopBookReader(DataReader):
         RuntimeError
         """
         df = pd.read_csv(path)
+        if progress is not None:
+            progress(os.path.getsize(path))
         cls._check_file(df.columns)
         return cls.standardize_df(df)
 
@@ -80,22 +87,22 @@ class TopBookReader(DataReader):
         # We have to manually determine the unit of the timestamp, because it is not done properly by pandas
         unit = cls._size_to_unit[len(str(df["nanosEpoch"][0]))]
 
-        df.drop(columns=["channelId"], inplace=True)
+        # the text time is superseded by the calendar columns computed on demand by .time_columns
+        df.drop(columns=["channelId", "time"], inplace=True)
         df["datetime"] = pd.to_datetime(df["nanosEpoch"], unit=unit)
-        df["date"] = df["datetime"].dt.date
-        df["hour"] = df["datetime"].dt.hour
-        df["minute"] = df["datetime"].dt.minute
-        df["second"] = df["datetime"].dt.second
-        df["microsecond"] = df["datetime"].dt.microsecond
-        df["time"] = df["datetime"].dt.time
+        # nanosEpoch is used as the time index, whatever the unit of the file
+        df["nanosEpoch"] = df["datetime"].values.astype("int64")
 
         # No direction because it is the top of the book (does not represent a trade)
         df["direction"] = ""
+        cls._categorize(df)
 
         df["spread"] = df["askPx"] - df["bidPx"]
         # TODO: find a better way
         df['cumulative_trade_volume'] = df['askSz']
+        cls._relative_prices(df)
         df['size_imbalance'] = df['askSz'] - df['bidSz']
+        cls._sort(df)
 
         if not inplace:
             return df
@@ -1,2 +1,5 @@
-from .settings import DATA_DIR, CACHE_DIR, DATA_FILES
+from .settings import DATA_DIR, CACHE_DIR, CACHE_MMAP, CACHE_HASH, CACHE_TMP_AGE, COMPACT_NUMERICS, \
+    GLOBAL_STORE_BUDGET, PARTITION_STORE_BUDGET, FILTERED_STORE_BUDGET, TABLE_STORE_BUDGET, BOOK_STORE_BUDGET, \
+    FEATURE_STORE_BUDGET, BAR_STORE_BUDGET, BAR_RESOLUTIONS, FIGURE_CACHE_DIR, FIGURE_CACHE, LOADING_WORKERS, \
+    DATA_FILES, CATALOG_FILE
 from .templates import HOVER_TEMPLATES, EMPTY_TEMPLATE
\ No newline at end of file
@@ -1,11 +1,48 @@
 from pathlib import Path
-from os import listdir
 
 
 DATA_DIR = Path(__file__).parent.joinpath("../data").resolve()
 
 CACHE_DIR = Path(__file__).parent.joinpath("../cache").resolve()
 
-# DATA_FILES = listdir(DATA_DIR)
-DATA_FILES = ['data_line_btc_full.data', 'data_line_btc.data', 'data_lines.data', 'data_lines_big.data',
-              'data_top_btc_full.csv', 'data_top.csv', 'data_top_big.csv']
+# Memory map numeric columns of cached data, shared across the processes serving the app.
+CACHE_MMAP = True
+
+# Also compare source files by content hash when their mtime changed, keeps the cache of files copied without change.
+CACHE_HASH = False
+
+# Age, in seconds, beyond which the temporary directory of an unfinished cache write is removed (see clean_cache) even
+# if its process is still running. Directories of processes which are gone are removed right away.
+CACHE_TMP_AGE = 3600
+
+# Store prices as float32 and sizes as int32, halves the memory of numeric columns at the cost of precision.
+COMPACT_NUMERICS = False
+
+# Memory budgets, in bytes, of the in-process caches of loaded files, partitions read from the cache of files not
+# loaded, filtered windows, sorted table rows, replayed order books, order book features and bars.
+GLOBAL_STORE_BUDGET = 4 * 1024 ** 3
+PARTITION_STORE_BUDGET = 1024 ** 3
+FILTERED_STORE_BUDGET = 1024 ** 3
+TABLE_STORE_BUDGET = 256 * 1024 ** 2
+BOOK_STORE_BUDGET = 512 * 1024 ** 2
+FEATURE_STORE_BUDGET = 1024 ** 3
+BAR_STORE_BUDGET = 256 * 1024 ** 2
+
+# Lengths, in nanoseconds, of the bars pre-aggregated for each file and cached next to its data, from the finest. Wide
+# windows are plotted from the coarsest bars which still fill the graphs, see utils.bars
+BAR_RESOLUTIONS = {'1s': 10 ** 9, '10s': 10 ** 10, '1m': 60 * 10 ** 9, '5m': 300 * 10 ** 9}
+
+# Number of files loaded at once in the background, see utils.loading
+LOADING_WORKERS = 2
+
+# Cache of the figures shared by all the processes serving the app (Flask-Caching config), on disk and bounded to
+# CACHE_THRESHOLD figures. Keys include the state of the source file, figures of a changed file are never served.
+FIGURE_CACHE_DIR = CACHE_DIR.joinpath("figures")
+FIGURE_CACHE = {'CACHE_TYPE': 'filesystem', 'CACHE_DIR': str(FIGURE_CACHE_DIR), 'CACHE_THRESHOLD': 1000,
+                'CACHE_DEFAULT_TIMEOUT': 0}
+
+# Data files shown in the app, all the files of DATA_DIR a reader can load if None, see utils.catalog
+DATA_FILES = None
+
+# Manifest of the catalog of the data files, maintained as files are loaded.
+CATALOG_FILE = CACHE_DIR.joinpath("catalog.json")
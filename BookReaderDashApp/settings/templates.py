@@ -10,6 +10,11 @@ HOVER_TEMPLATES = {
         "Trade Price: %{x}<br>" +
         "Volume: %{y}" +
         "<extra></extra>",
+    'book_figure':
+        "Time: %{x}<br>" +
+        "Price: %{y}<br>" +
+        "Resting size: %{z}" +
+        "<extra></extra>",
     'line':
         "Time: %{x}<br>" +
         "Price: %{y}"
@@ -1,13 +1,56 @@
 import unittest
 import tests.test_book_reader as t
+import tests.test_data_workflow as data_workflow
+import tests.test_catalog as catalog
+import tests.test_live as live
+import tests.test_dataset as dataset
+import tests.test_order_book as order_book
+import tests.test_features as features
+import tests.test_memory_cache as memory_cache
+import tests.test_downsampling as downsampling
+import tests.test_binning as binning
+import tests.test_bars as bars
+import tests.test_table as table
+import tests.test_loading as loading
+import tests.test_figure_configs as figure_configs
 
 
 def suite():
     suite = unittest.TestSuite()
     suite.addTest(t.TestBookReader('test_load_line'))
     suite.addTest(t.TestBookReader('test_load_top'))
+    suite.addTest(t.TestBookReader('test_parse_lines'))
+    suite.addTest(t.TestBookReader('test_load_chunks'))
+    suite.addTest(t.TestBookReader('test_load_incomplete_line'))
+    suite.addTest(t.TestBookReader('test_load_workers'))
+    suite.addTest(t.TestBookReader('test_load_progress'))
+    suite.addTest(t.TestBookReader('test_tail'))
+    suite.addTest(t.TestBookReader('test_serialize'))
+    suite.addTest(t.TestBookReader('test_compact_columns'))
     suite.addTest(t.TestDataWorkflow('test_data_workflow'))
     suite.addTest(t.TestDataWorkflow('test_data_workflow_cache'))
+    suite.addTest(data_workflow.TestDataWorkflow('test_partitions'))
+    suite.addTest(data_workflow.TestDataWorkflow('test_partition_features'))
+    suite.addTest(data_workflow.TestDataWorkflow('test_cache_invalidation'))
+    suite.addTest(data_workflow.TestDataWorkflow('test_clean_writes'))
+    suite.addTest(data_workflow.TestDataWorkflow('test_figure_key'))
+    suite.addTest(data_workflow.TestDataWorkflow('test_time_window'))
+    suite.addTest(data_workflow.TestDataWorkflow('test_zoom_range'))
+    suite.addTest(catalog.TestCatalog('test_catalog'))
+    suite.addTest(catalog.TestCatalog('test_concurrent_updates'))
+    suite.addTest(live.TestLive('test_follow_incomplete_line'))
+    suite.addTest(loading.TestLoading('test_load_in_background'))
+    suite.addTest(dataset.TestDataset('test_dataset_index'))
+    suite.addTest(dataset.TestDataset('test_best_quotes'))
+    suite.addTest(order_book.TestOrderBook('test_order_book'))
+    suite.addTest(features.TestFeatures('test_features'))
+    suite.addTest(memory_cache.TestMemoryCache('test_memory_cache'))
+    suite.addTest(downsampling.TestDownsampling('test_downsample'))
+    suite.addTest(binning.TestBinning('test_bin_2d'))
+    suite.addTest(binning.TestBinning('test_fill_levels'))
+    suite.addTest(bars.TestBars('test_build_pyramid'))
+    suite.addTest(table.TestTable('test_table_rows'))
+    suite.addTest(figure_configs.TestFigureConfigs('test_size_imbalance_levels'))
     suite.addTest(t.TestFigureFormatting('test_simple_figure'))
     suite.addTest(t.TestFigureFormatting('test_bid_ask_figure'))
     suite.addTest(t.TestFigureFormatting('test_depth_cum_figure'))
@@ -0,0 +1,54 @@
+import tempfile
+from pathlib import Path
+from unittest import TestCase, mock
+
+from utils import data_workflow, catalog, live, loading
+
+LINE_ENTRY = 'source Modify CAU19(79889147) Buy 168@82.353 (new qty/price) lvl=2 new number of orders = 31 ' \
+             'src=2019-08-07 06:05:26.621346 CDT our=2019-08-07 06:05:26.621346 CDT flags= seq=597283 ' \
+             'bid:89@82.326 ask:61@82.345 cbid:19@82.326 cask:78@82.345\n'
+
+# stores of data_workflow, emptied around each test as their keys are file names
+STORES = (data_workflow.global_store, data_workflow.partition_store, data_workflow.filtered_data_store,
+          data_workflow.table_rows_store, data_workflow.book_store, data_workflow.feature_store,
+          data_workflow.bar_store)
+
+
+class DataDirTestCase(TestCase):
+    """
+    Test case with its own empty data and cache directories, in place of DATA_DIR and CACHE_DIR.
+    """
+
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.data_dir, self.cache_dir = Path(tmp.name).joinpath('data'), Path(tmp.name).joinpath('cache')
+        self.data_dir.mkdir()
+
+        for module in (data_workflow, catalog, live):
+            for name, path in (('DATA_DIR', self.data_dir), ('CACHE_DIR', self.cache_dir)):
+                if hasattr(module, name):
+                    self.patch(module, name, path)
+        self.patch(catalog, 'CATALOG_FILE', self.cache_dir.joinpath('catalog.json'))
+
+        self.clear_stores()
+        self.addCleanup(self.clear_stores)
+
+    def patch(self, target, name, value):
+        """
+        Replace an attribute for the duration of the test
+        :param target: module or class
+        :param name: attribute name
+        :param value: value of the attribute during the test
+        """
+        patcher = mock.patch.object(target, name, value)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def clear_stores():
+        for store in STORES:
+            store.cache_clear()
+        live.offsets.clear()
+        with loading.jobs_lock:
+            loading.jobs.clear()
@@ -0,0 +1,37 @@
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from models import Dataset
+from utils.bars import build_pyramid
+
+
+class TestBars(TestCase):
+
+    def test_build_pyramid(self):
+        """
+        Bars hold the OHLC of the mid and trade prices and the volume by direction of each msuk and period, coarser bars
+        are aggregated from finer ones.
+        """
+        df = pd.DataFrame({'msuk': pd.Categorical([1, 1, 1, 1, 2]),
+                           'nanosEpoch': [0, 0, 5 * 10 ** 8, 15 * 10 ** 8, 2 * 10 ** 9],
+                           'bidPx': [10., 10., 11., 12., 20.], 'bidSz': [1, 1, 2, 3, 4],
+                           'askPx': [12., 12., 13., 14., 21.], 'askSz': [2, 2, 2, 2, 2],
+                           'spread': [2., 2., 2., 2., 1.], 'size_imbalance': [1, 1, 0, -1, -2],
+                           'tradePx': [10., np.nan, 13., 12., 21.], 'tradeSz': [5, 0, 2, 3, 1],
+                           'direction': pd.Categorical(['Buy', 'Sell', 'Sell', 'Buy', 'Buy'])})
+        pyramid = build_pyramid(Dataset(df), {'1s': 10 ** 9, '10s': 10 ** 10})
+
+        bars = pyramid['1s']
+        self.assertEqual(bars['nanosEpoch'].tolist(), [0, 10 ** 9, 2 * 10 ** 9])
+        self.assertEqual(bars[['mid_open', 'mid_high', 'mid_close', 'bidPx']].values.tolist()[0], [11., 12., 12., 11.])
+        self.assertEqual(bars[['trade_open', 'trade_close', 'buy_volume', 'sell_volume']].values.tolist()[0],
+                         [10., 13., 5., 2.])
+        self.assertEqual((bars['updates'].tolist(), bars['entries'].tolist()), ([2, 1, 1], [3, 1, 1]))
+
+        bars = pyramid['10s']
+        self.assertEqual(bars['msuk'].tolist(), [1, 2])
+        self.assertEqual(bars[['mid_open', 'mid_high', 'mid_low', 'mid_close']].values.tolist()[0],
+                         [11., 13., 11., 13.])
+        self.assertEqual((bars['buy_volume'].tolist(), bars['updates'].tolist()), ([8., 1.], [3., 1.]))
@@ -0,0 +1,39 @@
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from utils.binning import bin_2d, fill_levels
+
+
+class TestBinning(TestCase):
+
+    def test_bin_2d(self):
+        """
+        Cells are aggregated on a bounded grid, exactly when there are fewer distinct values than buckets.
+        """
+        z, x, y = bin_2d([1, 1, 2, 5], [10., 11., 10., float('nan')], [1., 3., 5., 7.], (10, 10))
+        self.assertEqual((x.tolist(), y.tolist()), ([1, 2], [10., 11.]))
+        self.assertEqual(z[0].tolist(), [1., 5.])
+        self.assertEqual(z[1, 0], 3.)
+        self.assertTrue(pd.isna(z[1, 1]))
+
+        z, x, y = bin_2d(range(1000), [i % 100 for i in range(1000)], [1.] * 1000, (10, 4), reduce='sum')
+        self.assertEqual(z.shape, (4, 10))
+        self.assertEqual((x[-1], y[-1]), (999, 99))
+        self.assertEqual(z.sum(), 1000)
+
+        # two sessions far apart: without a gap limit all their values fall in the first and last buckets
+        x = list(range(100)) + list(range(10 ** 6, 10 ** 6 + 100))
+        self.assertEqual(len(bin_2d(x, [1.] * 200, [1.] * 200, (10, 1))[1]), 2)
+        self.assertEqual(len(bin_2d(x, [1.] * 200, [1.] * 200, (10, 1), x_gap=1)[1]), 10)
+
+    def test_fill_levels(self):
+        """
+        Empty cells take the value of the previous (or next) non-empty cell of their column.
+        """
+        nan = float('nan')
+        z = np.array([[nan, 1.], [2., nan], [nan, nan]])
+        self.assertEqual(np.nan_to_num(fill_levels(z), nan=-1).tolist(), [[-1., 1.], [2., 1.], [2., 1.]])
+        self.assertEqual(np.nan_to_num(fill_levels(z, backward=True), nan=-1).tolist(),
+                         [[2., 1.], [2., -1.], [-1., -1.]])
@@ -1,15 +1,19 @@
 from unittest import TestCase
-from models import BookReader, TopBookReader
+
+import pandas as pd
+
+from models import BookReader, TopBookReader, Dataset
 from utils.data_workflow import load_data
 from utils.figure_configs import FigureGenerator
-from settings import DATA_DIR, DATA_FILES
+from settings import DATA_DIR
+from tests.base import DataDirTestCase, LINE_ENTRY
 
 DATA_LINE = ['data_line_btc_full.data', 'data_line_btc.data', 'data_lines.data', 'data_lines_big.data']
 
 DATA_TOP = ['data_top_btc_full.csv', 'data_top.csv', 'data_top_big.csv']
 
 
-class TestBookReader(TestCase):
+class TestBookReader(DataDirTestCase):
 
     def test_load_line(self):
         """
@@ -27,6 +31,148 @@ class TestBookReader(TestCase):
             df = TopBookReader.load(DATA_DIR.joinpath(file_path))
             TopBookReader._validate(df)
 
+    def test_parse_lines(self):
+        """
+        The single pass parser agrees with the per attribute parser and reports the failing line number. The level is
+        optional.
+        """
+        reordered = LINE_ENTRY.replace(' bid:89@82.326', '') + ' bid:89@82.326'
+        no_level = LINE_ENTRY.replace('lvl=2 ', '')
+        lines = [LINE_ENTRY, reordered, no_level, no_level.replace(' bid:89@82.326', '') + ' bid:89@82.326']
+        columns = BookReader._parse_lines(lines)
+        self.assertEqual(columns['level'].tolist(), [2, 2, -1, -1])
+        for number, line in enumerate(lines):
+            entry = BookReader._parse_entry(line, number)
+            for attr in ('msuk', 'tradeSz', 'tradePx', 'level', 'bidSz', 'bidPx', 'askPx', 'caskSz'):
+                self.assertEqual(columns[attr][number], type(columns[attr][number])(entry[attr]))
+            self.assertEqual(columns['direction'][number], entry['direction'])
+
+        with self.assertRaisesRegex(RuntimeError, 'line number `12`'):
+            BookReader._parse_lines([LINE_ENTRY, 'Modify CAU19(79889147)\n'], first_line_number=11)
+
+    def test_load_chunks(self):
+        """
+        Chunked loading gives the same frame whatever the chunk size, including groupby columns across chunks.
+        """
+        path = self.data_dir.joinpath('entries.data')
+        entries = [LINE_ENTRY.replace('Buy', direction) for direction in ('Buy', 'Sell', 'Buy') * 5]
+        path.write_text(''.join(entries))
+
+        df = BookReader.load(path, chunk_size=len(entries))
+        self.assertEqual(df['cumulative_trade_volume'].tolist()[-2:], [168 * 5, 168 * 10])
+        for chunk_size in (1, 2, 4):
+            pd.testing.assert_frame_equal(BookReader.load(path, chunk_size=chunk_size), df)
+
+        path.write_text(''.join(entries[:7]) + 'garbage\n')
+        with self.assertRaisesRegex(RuntimeError, 'line number `8`'):
+            BookReader.load(path, chunk_size=3)
+
+    def test_load_progress(self):
+        """
+        Progress is reported in bytes after each chunk or byte range, adding up to the size of the file.
+        """
+        path = self.data_dir.joinpath('entries.data')
+        path.write_text(LINE_ENTRY * 10)
+        for workers in (None, 3):
+            parsed = []
+            BookReader.load(path, chunk_size=4, workers=workers, progress=parsed.append)
+            self.assertEqual(sum(parsed), path.stat().st_size)
+            self.assertEqual(len(parsed), 3)
+
+    def test_tail(self):
+        """
+        Following a growing file parses complete new lines only, and extends the dataset as loading it again would.
+        """
+        path = self.data_dir.joinpath('entries.data')
+        path.write_text(LINE_ENTRY * 3)
+        dataset = Dataset(BookReader.load(path))
+        offset = BookReader.line_offset(path, len(dataset.df))
+        self.assertEqual(offset, path.stat().st_size)
+
+        with open(path, mode='a') as f:
+            f.write(LINE_ENTRY.replace('Buy', 'Sell') + LINE_ENTRY + LINE_ENTRY[:40])
+        df, next_offset = BookReader.tail(path, offset, dataset.traded_volume)
+        self.assertEqual((len(df), next_offset), (2, path.stat().st_size - 40))
+
+        with open(path, mode='a') as f:
+            f.write(LINE_ENTRY[40:])
+        extended = dataset.extend(df)
+        df, next_offset = BookReader.tail(path, next_offset, extended.traded_volume)
+        extended = extended.extend(df)
+        expected = Dataset(BookReader.load(path))
+        self.assertEqual((len(df), next_offset), (1, path.stat().st_size))
+        pd.testing.assert_frame_equal(extended.df, expected.df)
+        pd.testing.assert_frame_equal(extended.quotes.df, expected.quotes.df)
+        self.assertEqual(extended.df['cumulative_trade_volume'].tolist(), [168, 336, 504, 168, 672, 840])
+
+    def test_load_incomplete_line(self):
+        """
+        A last line without a newline is loaded as the others, unless following a growing file.
+        """
+        path = self.data_dir.joinpath('entries.data')
+        path.write_text(LINE_ENTRY * 3 + LINE_ENTRY[:-1])
+        for workers in (None, 2):
+            self.assertEqual(len(BookReader.load(path, chunk_size=2, workers=workers)), 4)
+            self.assertEqual(len(BookReader.load(path, chunk_size=2, workers=workers, complete_lines=True)), 3)
+
+    def test_load_workers(self):
+        """
+        Parallel loading stitches the ranges in file order and reports global line numbers.
+        """
+        path = self.data_dir.joinpath('entries.data')
+        entries = [LINE_ENTRY.replace('Buy', direction).replace('@82.353', f'@{82 + i / 100}')
+                   for i, direction in enumerate(('Buy', 'Sell') * 20)]
+        path.write_text(''.join(entries))
+
+        df = BookReader.load(path)
+        pd.testing.assert_frame_equal(BookReader.load(path, chunk_size=4, workers=3), df)
+
+        path.write_text(''.join(entries[:30]) + 'garbage\n' + ''.join(entries[30:]))
+        with self.assertRaisesRegex(RuntimeError, 'line number `31`'):
+            BookReader.load(path, chunk_size=4, workers=3)
+
+    def test_serialize(self):
+        """
+        Columnar serialization round trip, for all columns and for a subset.
+        """
+        path = self.data_dir.joinpath('entries.data')
+        path.write_text(''.join(LINE_ENTRY.replace('Buy', direction) for direction in ('Buy', 'Sell') * 3))
+        df = BookReader.load(path)
+
+        BookReader.serialize(df, self.cache_dir)
+        pd.testing.assert_frame_equal(BookReader.deserialize(self.cache_dir), df)
+
+        subset = BookReader.deserialize(self.cache_dir, columns=['bidPx', 'direction'])
+        pd.testing.assert_frame_equal(subset, df[['direction', 'bidPx']])
+
+        mapped = BookReader.deserialize(self.cache_dir, mmap=True)
+        pd.testing.assert_frame_equal(mapped, df)
+        self.assertFalse(mapped['bidPx'].values.flags.writeable)
+
+        with self.assertRaises(RuntimeError):
+            BookReader.serialize(df.drop(columns='spread'), self.cache_dir)
+
+    def test_compact_columns(self):
+        """
+        Categorical and downcast columns, calendar columns computed on demand.
+        """
+        path = self.data_dir.joinpath('entries.data')
+        path.write_text(''.join(LINE_ENTRY.replace('Buy', direction) for direction in ('Buy', 'Sell') * 3))
+        df = BookReader.load(path)
+
+        self.assertEqual(str(df['msuk'].dtype), 'category')
+        self.assertEqual(df['direction'].cat.categories.tolist(), ['Buy', 'Sell'])
+        self.assertFalse(any(c in df.columns for c in BookReader._time_columns))
+
+        times = BookReader.time_columns(df.iloc[2:4])
+        self.assertEqual(times.index.tolist(), [2, 3])
+        self.assertEqual(str(times['time'].iloc[0]), '06:05:26.621346')
+        self.assertEqual(times['hour'].iloc[0], 6)
+
+        BookReader.downcast(df)
+        self.assertEqual(df['bidPx'].dtype, 'float32')
+        self.assertEqual(df['size_imbalance'].dtype, 'int32')
+
 
 class TestDataWorkflow(TestCase):
 
@@ -0,0 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from models import Dataset
+from utils import catalog
+from utils.data_workflow import load_data
+from tests.base import DataDirTestCase, LINE_ENTRY
+
+
+class TestCatalog(DataDirTestCase):
+
+    def test_catalog(self):
+        """
+        Files are listed without being parsed, and described once loaded, until they change.
+        """
+        self.data_dir.joinpath('entries.data').write_text(LINE_ENTRY * 3)
+        self.data_dir.joinpath('raw.csv').write_text('timestamp,symbol,side,size,price\n')
+
+        self.assertEqual(list(catalog.scan_catalog()), ['entries.data'])
+        self.assertNotIn('rows', catalog.scan_catalog()['entries.data'])
+
+        catalog.update_catalog('entries.data', Dataset(load_data('entries.data')).df)
+        entry = catalog.scan_catalog()['entries.data']
+        self.assertEqual((entry['rows'], entry['dates']), (3, ['2019-08-07']))
+        self.assertEqual(catalog.msuk_options(entry)[0]['value'], entry['msuks'][0][0])
+
+        self.data_dir.joinpath('entries.data').write_text(LINE_ENTRY * 4)
+        self.assertNotIn('rows', catalog.scan_catalog()['entries.data'])
+
+    def test_concurrent_updates(self):
+        """
+        Files described while the catalog is scanned by other threads all stay described in the manifest.
+        """
+        files = [f'entries_{number}.data' for number in range(8)]
+        for file in files:
+            self.data_dir.joinpath(file).write_text(LINE_ENTRY)
+        df = Dataset(load_data(files[0])).df
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(catalog.update_catalog, file, df) for file in files]
+            futures += [executor.submit(catalog.scan_catalog) for _ in range(16)]
+            for future in futures:
+                future.result()
+        manifest = catalog.read_manifest()
+        self.assertEqual([manifest[file].get('rows') for file in files], [1] * len(files))
+        self.assertEqual(list(self.cache_dir.glob('*.tmp')), [])
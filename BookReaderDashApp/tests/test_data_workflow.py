@@ -0,0 +1,143 @@
+import os
+import subprocess
+import sys
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from models import BookReader
+from utils import data_workflow
+from utils.data_workflow import load_data
+from tests.base import DataDirTestCase, LINE_ENTRY
+
+
+class TestDataWorkflow(DataDirTestCase):
+
+    def test_partitions(self):
+        """
+        Serialized data is indexed by msuk and date, a partition is read alone and filtered as the whole file.
+        """
+        lines = [LINE_ENTRY, LINE_ENTRY.replace('79889147', '79889148'), LINE_ENTRY.replace('2019-08-07', '2019-08-08')]
+        self.data_dir.joinpath('entries.data').write_text(''.join(lines * 2))
+
+        df = load_data('entries.data')
+        self.assertEqual(BookReader.partitions(self.cache_dir.joinpath('entries')),
+                         {(79889147, '2019-08-07'): (0, 2), (79889147, '2019-08-08'): (2, 4),
+                          (79889148, '2019-08-07'): (4, 6)})
+        for mmap in (False, True):
+            partition = data_workflow.load_partition('entries.data', 79889147, '2019-08-08', mmap=mmap)
+            pd.testing.assert_frame_equal(partition, df.iloc[2:4].reset_index(drop=True))
+        self.assertEqual(len(data_workflow.load_partition('entries.data', 79889148, '2019-08-08')), 0)
+
+        args = ('entries.data', '2019-08-08', 79889147, True, [0, 24], [0, 60], [0, 60], [0, 1000000])
+        self.assertEqual(data_workflow.get_filtered_data(*args)['nanosEpoch'].tolist(),
+                         df['nanosEpoch'].iloc[2:4].tolist())
+        times, levels = data_workflow.get_book_levels(None, 2, 10, *args)
+        self.assertEqual(levels['bidPx'][0].tolist()[0], 82.353)
+        self.assertIsNone(data_workflow.get_book_levels(None, 2, 10, *(args[:2] + (None,) + args[3:])))
+        # read from the partition, the file is not loaded
+        self.assertFalse(data_workflow.global_store.contains('entries.data', True))
+
+        self.data_dir.joinpath('entries.data').write_text(''.join(lines))
+        self.assertIsNone(data_workflow.load_partition('entries.data', 79889147, '2019-08-08'))
+
+    def test_partition_features(self):
+        """
+        Book features of a partition are replayed from the rows of its msuk in the cache, the file is not loaded, and
+        match the features of the loaded file.
+        """
+        sell = LINE_ENTRY.replace('Buy', 'Sell').replace('168@82.353', '100@82.36')
+        lines = [LINE_ENTRY, sell.replace('06:05:26', '06:05:27'), LINE_ENTRY.replace('79889147', '79889148'),
+                 sell.replace('2019-08-07', '2019-08-08'),
+                 LINE_ENTRY.replace('2019-08-07 06:05:26', '2019-08-08 06:05:28').replace('168@', '50@')]
+        self.data_dir.joinpath('entries.data').write_text(''.join(lines))
+        load_data('entries.data', use_cache=True, downcast=data_workflow.COMPACT_NUMERICS)
+
+        args = ('entries.data', '2019-08-08', 79889147, True, [0, 24], [0, 60], [0, 60], [0, 1000000])
+        features = ['imbalance_1', 'depth_imbalance_2', 'cumulative_ofi']
+        partition = data_workflow.get_feature_data(None, features, *args)
+        self.assertFalse(data_workflow.global_store.contains('entries.data', True))
+        # the bid of the previous day is still in the book
+        self.assertEqual(partition['imbalance_1'].tolist(), [(100 - 168) / 268, (100 - 50) / 150])
+
+        data_workflow.global_store('entries.data', True)
+        loaded = data_workflow.get_feature_data(None, features, *args)
+        np.testing.assert_array_equal(partition[features].values, loaded[features].values)
+
+    def test_cache_invalidation(self):
+        """
+        Changed source files are re-parsed, removed ones have their cache cleaned up.
+        """
+        self.data_dir.joinpath('entries.data').write_text(LINE_ENTRY * 3)
+
+        self.assertEqual(len(load_data('entries.data', use_cache=True)), 3)
+        self.assertTrue(data_workflow.is_cache_fresh('entries.data',
+                                                     BookReader.metadata(self.cache_dir.joinpath('entries'))))
+
+        self.data_dir.joinpath('entries.data').write_text(LINE_ENTRY * 4)
+        self.assertEqual(len(load_data('entries.data', use_cache=True)), 4)
+
+        self.data_dir.joinpath('entries.data').unlink()
+        self.assertEqual(data_workflow.clean_cache(), ['entries'])
+
+    def test_clean_writes(self):
+        """
+        Temporary directories of cache writes are removed once their process is gone or they are too old.
+        """
+        process = subprocess.Popen([sys.executable, '-c', ''])
+        process.wait()
+        self.cache_dir.mkdir()
+        running, gone, old = (self.cache_dir.joinpath(f'entries.{pid}.tmp') for pid in (os.getpid(), process.pid, 1))
+        for path in (running, gone, old):
+            path.mkdir()
+        os.utime(old, (0, 0))
+        self.assertEqual(sorted(data_workflow.clean_cache()), sorted([gone.name, old.name]))
+        self.assertEqual(list(self.cache_dir.iterdir()), [running])
+
+    def test_figure_key(self):
+        """
+        Figure keys depend on the figure, its parameters and filters, and change with the source file and the version
+        and settings of the figures.
+        """
+        args = ['entries.data', None, None, True, [6, 6], [0, 60], [0, 60], [0, 1000000]]
+        self.data_dir.joinpath('entries.data').write_text(LINE_ENTRY)
+        key = data_workflow.figure_key('depth_2', *args, scale=2)
+        self.assertEqual(data_workflow.figure_key('depth_2', *args, scale=2), key)
+        self.assertNotEqual(data_workflow.figure_key('depth_2', *args, scale=3), key)
+        self.assertNotEqual(data_workflow.figure_key('depth_2', *args[:4], [7, 7], *args[5:], scale=2), key)
+        with mock.patch.object(data_workflow, 'FIGURE_VERSION', -1):
+            self.assertNotEqual(data_workflow.figure_key('depth_2', *args, scale=2), key)
+        with mock.patch.object(data_workflow, 'HEATMAP_BINS', {'time': 10, 'price': 10}):
+            self.assertNotEqual(data_workflow.figure_key('depth_2', *args, scale=2), key)
+
+        self.data_dir.joinpath('entries.data').write_text(LINE_ENTRY * 2)
+        self.assertNotEqual(data_workflow.figure_key('depth_2', *args, scale=2), key)
+
+    def test_time_window(self):
+        """
+        Slider values translate to one time window, resolved by binary search on sorted data.
+        """
+        hour, minute, second = 3600 * 10 ** 9, 60 * 10 ** 9, 10 ** 9
+        full = [{'min': 0, 'max': 60}, {'min': 0, 'max': 60}, {'min': 0, 'max': 1000000}]
+        self.assertEqual(data_workflow.window_offsets([{'min': 6, 'max': 10}] + full), (6 * hour, 11 * hour))
+        self.assertEqual(data_workflow.window_offsets([{'min': 0, 'max': 24}] + full), (0, 24 * hour))
+        self.assertEqual(data_workflow.window_offsets([{'min': 6, 'max': 6}, {'min': 4, 'max': 10}] + full[1:]),
+                         (6 * hour + 4 * minute, 6 * hour + 11 * minute))
+        self.assertEqual(data_workflow.window_offsets([{'min': 6, 'max': 6}, {'min': 4, 'max': 4},
+                                                       {'min': 5, 'max': 5}, {'min': 10, 'max': 20}]),
+                         (6 * hour + 4 * minute + 5 * second + 10000, 6 * hour + 4 * minute + 5 * second + 21000))
+
+    def test_zoom_range(self):
+        """
+        relayoutData of a zoomed graph translates to a nanosEpoch range, autorange to the whole window.
+        """
+        start = pd.Timestamp('2019-08-07 06:10:00').value
+        self.assertEqual(data_workflow.zoom_range({'xaxis.range[0]': '2019-08-07 06:10:00',
+                                                   'xaxis.range[1]': '2019-08-07 06:10:00.5'}),
+                         (start, start + 5 * 10 ** 8 + 1))
+        self.assertEqual(data_workflow.zoom_range({'xaxis.range': ['2019-08-07 06:10:00', '2019-08-07 06:10:01']}),
+                         (start, start + 10 ** 9 + 1))
+        self.assertIsNone(data_workflow.zoom_range({'xaxis.autorange': True}))
+        self.assertIsNone(data_workflow.zoom_range({'yaxis.range[0]': 1, 'yaxis.range[1]': 2}))
+        self.assertIsNone(data_workflow.zoom_range(None))
@@ -0,0 +1,42 @@
+from unittest import TestCase
+
+import pandas as pd
+
+from models import Dataset
+
+
+class TestDataset(TestCase):
+
+    def test_dataset_index(self):
+        """
+        Rows are partitioned by msuk, windows are found by binary search within partitions, or within the rows sorted by
+        time over all the msuks.
+        """
+        df = pd.DataFrame({'msuk': pd.Categorical([7, 7, 7, 9, 9]), 'nanosEpoch': [1, 3, 8, 3, 5]})
+        dataset = Dataset(df)
+        self.assertEqual(dataset.msuk_index, {7: (0, 3), 9: (3, 5)})
+        self.assertEqual([option['value'] for option in dataset.msuk_options()], [7, 9])
+        self.assertEqual(dataset.partition(9).index.tolist(), [3, 4])
+        self.assertEqual(dataset.partition(8).index.tolist(), [])
+        self.assertEqual(dataset.window(3, 8, 7).index.tolist(), [1])
+        self.assertEqual(dataset.window(3, 9).index.tolist(), [1, 3, 4, 2])
+        self.assertEqual(dataset.window(9, 10).index.tolist(), [])
+        self.assertEqual(dataset.time_order()[0].tolist(), [0, 1, 3, 4, 2])
+        self.assertIs(dataset.time_order(), dataset.time_order())
+        self.assertEqual(Dataset.time_slice(df.iloc[:3], 2, 9).index.tolist(), [1, 2])
+        self.assertEqual(Dataset.time_rows(df.iloc[3:], 4, tolerance=1).index.tolist(), [3])
+        self.assertEqual(Dataset.time_rows(df.iloc[3:], 6, tolerance=1).index.tolist(), [4])
+        self.assertEqual(Dataset.time_rows(df.iloc[3:], 9, tolerance=1).index.tolist(), [])
+
+    def test_best_quotes(self):
+        """
+        The best quotes table has one row per book update, with the row range of the update.
+        """
+        df = pd.DataFrame({'msuk': pd.Categorical([7, 7, 7, 9, 9]), 'nanosEpoch': [1, 1, 8, 8, 8],
+                           'bidPx': [10., 10., 11., 20., 20.], 'tradePx': [9., 8., 10., 19., 18.]})
+        quotes = Dataset(df).quotes
+        self.assertEqual(quotes.df.columns.tolist(), ['nanosEpoch', 'msuk', 'bidPx', 'row', 'row_count'])
+        self.assertEqual(quotes.df[['nanosEpoch', 'bidPx', 'row', 'row_count']].values.tolist(),
+                         [[1, 10., 0, 2], [8, 11., 2, 1], [8, 20., 3, 2]])
+        self.assertEqual(quotes.window(0, 10, 9).index.tolist(), [2])
+        self.assertIsNone(quotes.quotes)
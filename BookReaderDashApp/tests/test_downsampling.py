@@ -0,0 +1,23 @@
+from unittest import TestCase
+
+import pandas as pd
+
+from utils.downsampling import downsample
+
+
+class TestDownsampling(TestCase):
+
+    def test_downsample(self):
+        """
+        Series are reduced to the point budget, keeping their end points and, with min/max bucketing, their extremes.
+        """
+        values = [(i * 7919) % 1000 for i in range(10000)]
+        df = pd.DataFrame({'datetime': pd.to_datetime(range(10000)), 'bidPx': values, 'askPx': values[::-1]})
+        for method in ('lttb', 'minmax'):
+            reduced = downsample(df, ['bidPx', 'askPx'], 500, method)
+            self.assertLessEqual(len(reduced), 500)
+            self.assertTrue(reduced['datetime'].is_monotonic_increasing)
+            self.assertEqual(reduced.index[[0, -1]].tolist(), [0, 9999])
+        reduced = downsample(df, ['bidPx'], 100, 'minmax')
+        self.assertEqual((reduced['bidPx'].min(), reduced['bidPx'].max()), (0, 999))
+        self.assertIs(downsample(df, ['bidPx'], None), df)
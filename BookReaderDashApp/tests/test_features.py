@@ -0,0 +1,33 @@
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from models import OrderBook
+from utils.features import quote_features
+
+
+class TestFeatures(TestCase):
+
+    def test_features(self):
+        """
+        Order book features match their definition, the order flow imbalance restarts at each msuk, the levels after
+        each update match the replayed book.
+        """
+        quotes = pd.DataFrame({'msuk': pd.Categorical([1, 1, 1, 2, 2]), 'bidPx': [10., 10., 11., 20., 20.],
+                               'bidSz': [4, 6, 2, 1, 1], 'askPx': [12., 11., 12., 21., 22.], 'askSz': [4, 2, 3, 3, 5]})
+        features = quote_features(quotes)
+        np.testing.assert_allclose(features['imbalance'], [0., -.5, .2, .5, 2 / 3])
+        np.testing.assert_allclose(features['microprice'][:2], [11., 10.75])
+        np.testing.assert_allclose(features['ofi'], [0., (6 - 4) - 2, 2 + 2, 0., 3])
+        np.testing.assert_allclose(features['cumulative_ofi'], [0., 0., 4., 0., 3.])
+
+        df = pd.DataFrame({'nanosEpoch': [1, 2, 3, 4, 5, 6, 7],
+                           'direction': pd.Categorical(['Buy', 'Sell', 'Buy', 'Sell', 'Buy', 'Buy', 'Sell']),
+                           'tradePx': [10., 12., 11., 13., 10., 9., 12.], 'tradeSz': [5, 6, 7, 8, 0, 4, 2]})
+        book = OrderBook(df)
+        book._chunk_updates = 3
+        counts = np.array([1, 2, 4, 5, 7])
+        levels, expected = book.levels_after(counts, depth=2), book.levels(counts, depth=2)
+        for key in expected:
+            np.testing.assert_array_equal(levels[key], expected[key])
@@ -0,0 +1,21 @@
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from utils.figure_configs import FigureGenerator
+
+
+class TestFigureConfigs(TestCase):
+
+    def test_size_imbalance_levels(self):
+        """
+        The imbalance of each level of the book is plotted below the size imbalance, levels without values are left out.
+        """
+        df = pd.DataFrame({'datetime': pd.to_datetime([1, 2, 3]), 'size_imbalance': [1, -2, 3]})
+        levels = pd.DataFrame({'datetime': df['datetime'], 'nanosEpoch': [1, 2, 3], 'imbalance_1': [.5, -.2, 0.],
+                               'imbalance_2': [np.nan, 1., -1.], 'imbalance_3': [np.nan] * 3})
+        fig = FigureGenerator.size_imbalance_figure(df, levels)
+        self.assertEqual([trace.name for trace in fig.data], ['size_imbalance', 'Level 1', 'Level 2'])
+        self.assertEqual(fig.data[2].yaxis, 'y2')
+        self.assertEqual(len(FigureGenerator.size_imbalance_figure(df).data), 1)
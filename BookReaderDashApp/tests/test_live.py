@@ -0,0 +1,25 @@
+from utils import data_workflow, live
+from tests.base import DataDirTestCase, LINE_ENTRY
+
+
+class TestLive(DataDirTestCase):
+
+    def test_follow_incomplete_line(self):
+        """
+        A line still being written when the file is loaded is dropped when following the file, and loaded once complete.
+        """
+        path = self.data_dir.joinpath('entries.data')
+        path.write_text(LINE_ENTRY * 3 + LINE_ENTRY[:-5])
+
+        dataset, _ = data_workflow.global_store('entries.data', False)
+        self.assertEqual(dataset.df['caskPx'].tolist(), [82.345] * 3 + [82.])
+        self.assertIsNone(live.follow('entries.data', False))
+        dataset, _ = data_workflow.global_store('entries.data', False)
+        self.assertEqual(dataset.df['caskPx'].tolist(), [82.345] * 3)
+
+        with open(path, mode='a') as f:
+            f.write(LINE_ENTRY[-5:])
+        self.assertEqual(len(live.follow('entries.data', False).df), 1)
+        dataset, _ = data_workflow.global_store('entries.data', False)
+        self.assertEqual(dataset.df['caskPx'].tolist(), [82.345] * 4)
+        self.assertIsNone(live.follow('entries.data', False))
@@ -0,0 +1,25 @@
+from unittest import mock
+
+from utils import loading
+from tests.base import DataDirTestCase, LINE_ENTRY
+
+
+class TestLoading(DataDirTestCase):
+
+    def test_load_in_background(self):
+        """
+        A file which failed to load is not loaded again while polling its job (ticks of loading_interval or of the live
+        interval), only when retrying (the file is selected again).
+        """
+        self.data_dir.joinpath('broken.data').write_text('garbage\n')
+        with mock.patch.object(loading.executor, 'submit', wraps=loading.executor.submit) as submit:
+            job = loading.load_in_background('broken.data', False)
+            self.assertIsInstance(job.exception(), RuntimeError)
+            for _ in range(3):
+                self.assertIs(loading.load_in_background('broken.data', False, retry=False), job)
+            self.assertEqual(submit.call_count, 1)
+
+            self.data_dir.joinpath('broken.data').write_text(LINE_ENTRY)
+            job = loading.load_in_background('broken.data', False)
+            self.assertEqual((submit.call_count, len(job.result()[0].df)), (2, 1))
+            self.assertIs(loading.load_in_background('broken.data', False, retry=False), job)
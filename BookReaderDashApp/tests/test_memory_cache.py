@@ -0,0 +1,33 @@
+from unittest import TestCase
+
+import pandas as pd
+
+from utils.memory_cache import memory_cache
+
+
+class TestMemoryCache(TestCase):
+
+    def test_memory_cache(self):
+        """
+        Least recently used results are evicted beyond the memory budget, except pinned ones. Results can be replaced
+        or dropped.
+        """
+        @memory_cache(budget=3000)
+        def frame(rows):
+            return pd.DataFrame({'values': range(rows)})
+
+        frame(100), frame(100), frame(200)
+        self.assertEqual(frame.cache_info()['hits'], 1)
+        self.assertEqual(frame.cache_info()['evictions'], 0)
+
+        frame.pin(100)
+        frame(150)
+        self.assertEqual(list(frame.entries), [(100,), (150,)])
+        self.assertEqual(frame.cache_info()['evictions'], 1)
+        self.assertLessEqual(frame.cache_info()['bytes'], 3000)
+
+        frame.store(pd.DataFrame({'values': range(10)}), rows=150)
+        self.assertEqual(len(frame(rows=150)), 10)
+        frame.invalidate(rows=150)
+        self.assertFalse(frame.contains(rows=150))
+        self.assertTrue(frame.contains(100))
@@ -0,0 +1,29 @@
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from models import BookReader, OrderBook
+from tests.base import LINE_ENTRY
+
+
+class TestOrderBook(TestCase):
+
+    def test_order_book(self):
+        """
+        Level updates replayed from any checkpoint give the same book, null sizes remove levels.
+        """
+        df = pd.DataFrame({'nanosEpoch': [1, 2, 3, 4, 5, 6, 7],
+                           'direction': pd.Categorical(['Buy', 'Sell', 'Buy', 'Sell', 'Buy', 'Buy', 'Sell']),
+                           'tradePx': [10., 12., 11., 13., 10., 9., 12.], 'tradeSz': [5, 6, 7, 8, 0, 4, 2]})
+        for interval in (1, 2, 100):
+            book = OrderBook(df, checkpoint_interval=interval)
+            self.assertEqual(book.snapshot(5).values.tolist(), [['Buy', 11., 7], ['Sell', 12., 6], ['Sell', 13., 8]])
+            self.assertEqual(book.snapshot(0).values.tolist(), [])
+
+            levels = book.levels(np.array([2, 5, 7]), depth=2)
+            np.testing.assert_array_equal(levels['bidPx'], [[10., np.nan], [11., np.nan], [11., 9.]])
+            np.testing.assert_array_equal(levels['askSz'], [[6, 0], [6, 8], [2, 8]])
+
+        entry = BookReader._parse_lines([LINE_ENTRY])
+        self.assertEqual((entry['level'][0], entry['tradePx'][0], entry['tradeSz'][0]), (2, 82.353, 168))
@@ -0,0 +1,27 @@
+from unittest import TestCase
+
+import pandas as pd
+
+from utils.table import table_rows, table_page
+
+
+class TestTable(TestCase):
+
+    def test_table_rows(self):
+        """
+        Filter queries and sorts of the table are applied on the server, only the current page is serialized.
+        """
+        df = pd.DataFrame({'nanosEpoch': [pd.Timestamp('2019-08-07 06:00').value + i * 10 ** 9 for i in range(6)],
+                           'tradeSz': [5, 1, 4, 1, 3, 2], 'direction': pd.Categorical(['Buy', 'Sell'] * 3)})
+        self.assertEqual(table_rows(df).tolist(), list(range(6)))
+        self.assertEqual(table_rows(df, (), '{tradeSz} > 1 && {direction} = Buy').tolist(), [0, 2, 4])
+        self.assertEqual(table_rows(df, (), '{direction} contains "Se"').tolist(), [1, 3, 5])
+        self.assertEqual(table_rows(df, (), '{time} >= 06:00:04').tolist(), [4, 5])
+        self.assertEqual(table_rows(df, (), '{tradeSz} = abc').tolist(), [])
+        self.assertEqual(table_rows(df, (), '{direction} > Buy').tolist(), [1, 3, 5])
+        rows = table_rows(df, (('tradeSz', 'asc'), ('time', 'desc')))
+        self.assertEqual(rows.tolist(), [3, 1, 5, 4, 2, 0])
+
+        page = table_page(df, rows, 1, 4, ['time', 'tradeSz'])
+        self.assertEqual([record['tradeSz'] for record in page], [4, 5])
+        self.assertEqual(str(page[0]['time']), '06:00:02')
@@ -1,4 +1,6 @@
 from .ui import generate_slider, generate_colors, generate_datatable
 from .data_workflow import load_data
-from .settings import FEATURES, TIME_RANGES, COLUMNS_FOR_DATA_TABLE, APP_INPUTS
+from .settings import FIGURE_VERSION, FEATURES, TIME_RANGES, COLUMNS_FOR_DATA_TABLE, TABLE_PAGE_SIZE, APP_INPUTS, POINT_BUDGETS, DOWNSAMPLING_METHOD, \
+    HEATMAP_BINS, HEATMAP_GAP, DETAIL_TOLERANCE, LIVE_INTERVAL, LIVE_POINTS, BOOK_DEPTH, \
+    FEATURE_LEVELS
 from .figure_configs import FigureGenerator
\ No newline at end of file
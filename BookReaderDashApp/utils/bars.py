@@ -0,0 +1,131 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from settings import BAR_RESOLUTIONS
+
+logger = logging.getLogger(__name__)
+
+# bar columns computed from the best quotes table and from the entries: (bar column, source column, reducer), see
+# _reduce. The closes of the quote columns keep their names, so that the line charts plot bars as they plot quotes.
+QUOTE_BARS = (('mid_open', 'mid', 'first'), ('mid_high', 'mid', 'max'), ('mid_low', 'mid', 'min'),
+              ('mid_close', 'mid', 'last'), ('spread_min', 'spread', 'min'), ('spread_max', 'spread', 'max'),
+              ('spread_mean', 'spread', 'mean'), ('bidPx', 'bidPx', 'close'), ('bidSz', 'bidSz', 'close'),
+              ('askPx', 'askPx', 'close'), ('askSz', 'askSz', 'close'), ('spread', 'spread', 'close'),
+              ('size_imbalance', 'size_imbalance', 'close'), ('updates', 'updates', 'sum'))
+TRADE_BARS = (('trade_open', 'tradePx', 'first'), ('trade_high', 'tradePx', 'max'), ('trade_low', 'tradePx', 'min'),
+              ('trade_close', 'tradePx', 'last'), ('buy_volume', 'buy_volume', 'sum'),
+              ('sell_volume', 'sell_volume', 'sum'), ('entries', 'entries', 'sum'))
+
+
+def build_pyramid(dataset, resolutions=BAR_RESOLUTIONS):
+    """
+    Bars of a dataset at increasing resolutions, each level aggregated from the previous one, so that only the finest
+    level reads the whole data
+    :param dataset: a models.Dataset with its best quotes
+    :param resolutions: from label to bar length in nanoseconds, from the finest
+    :return: from label to bars, sorted by msuk then time as the dataset (see raw_bars)
+    """
+    pyramid, bars = {}, None
+    for label, resolution in resolutions.items():
+        bars = raw_bars(dataset, resolution) if bars is None else coarsen(bars, resolution)
+        pyramid[label] = bars
+        logger.info(f"Built {len(bars)} bars of {label}")
+    return pyramid
+
+
+def raw_bars(dataset, resolution):
+    """
+    Bars of each msuk from the book updates and entries of a dataset
+    :param dataset: a models.Dataset with its best quotes
+    :param resolution: bar length in nanoseconds
+    :return: one row per msuk and bar with entries: `nanosEpoch` and `datetime` of the start of the bar, `msuk`, OHLC of
+    the mid and trade prices, min, max and mean of the spread, last best quotes, volume by direction and number of
+    updates and entries
+    """
+    quotes, df = dataset.quotes.df, dataset.df
+    bid, ask = quotes['bidPx'].values.astype(np.float64), quotes['askPx'].values.astype(np.float64)
+    quote_columns = {column: quotes[column].values for column in ('bidPx', 'bidSz', 'askPx', 'askSz', 'spread',
+                                                                  'size_imbalance')}
+    quote_columns.update(mid=(bid + ask) / 2, updates=np.ones(len(quotes)))
+
+    sizes = np.nan_to_num(df['tradeSz'].values.astype(np.float64))
+    direction = np.asarray(df['direction'].values)
+    trade_columns = {'tradePx': df['tradePx'].values, 'buy_volume': np.where(direction == 'Buy', sizes, 0.),
+                     'sell_volume': np.where(direction == 'Sell', sizes, 0.), 'entries': np.ones(len(df))}
+
+    # the entries of a book update share its msuk and time, quotes and entries have the same bars
+    bars = _aggregate(quotes, quote_columns, QUOTE_BARS, resolution, weights=quote_columns['updates'])
+    trades = _aggregate(df, trade_columns, TRADE_BARS, resolution, weights=trade_columns['entries'])
+    return pd.concat([bars, trades.drop(columns=['nanosEpoch', 'datetime', 'msuk'])], axis=1)
+
+
+def coarsen(bars, resolution):
+    """
+    Aggregate bars into longer ones
+    :param bars: bars as returned by raw_bars
+    :param resolution: bar length in nanoseconds, a multiple of the length of the bars
+    :return: bars of the new length
+    """
+    spec = [(column, column, reducer) for column, _, reducer in QUOTE_BARS + TRADE_BARS]
+    # means are weighted by the number of updates of each bar
+    return _aggregate(bars, bars, spec, resolution, weights=bars['updates'].values)
+
+
+def _aggregate(df, columns, spec, resolution, weights):
+    """
+    :param df: dataframe sorted by a categorical `msuk` then `nanosEpoch`
+    :param columns: from source column to values aligned with df
+    :param spec: (bar column, source column, reducer) tuples
+    :param resolution: bar length in nanoseconds
+    :param weights: weights of the rows of df for the means
+    :return: bars dataframe, one row per msuk and bar with at least one row
+    """
+    codes, nanos = df['msuk'].cat.codes.values, df['nanosEpoch'].values
+    buckets = nanos // resolution
+    new_bar = np.ones(len(df), dtype=bool)
+    new_bar[1:] = (codes[1:] != codes[:-1]) | (buckets[1:] != buckets[:-1])
+    starts = np.flatnonzero(new_bar)
+    stops = np.append(starts[1:], len(df))
+
+    times = buckets[starts] * resolution
+    bars = {'nanosEpoch': times, 'datetime': pd.to_datetime(times), 'msuk': df['msuk'].values.take(starts)}
+    for column, source, reducer in spec:
+        bars[column] = _reduce(np.asarray(columns[source]), starts, stops, reducer, weights)
+    return pd.DataFrame(bars)
+
+
+def _reduce(values, starts, stops, reducer, weights):
+    """
+    :param values: values of the rows, sorted by bar
+    :param starts: position of the first row of each bar
+    :param stops: position after the last row of each bar
+    :param reducer: 'first' or 'last' non-NaN value, 'close' value of the last row, 'max', 'min', 'sum' or weighted
+    'mean' of the non-NaN values
+    :param weights: weights of the rows for 'mean'
+    :return: one value per bar, NaN when a bar has no value
+    """
+    if reducer == 'close':
+        return values[stops - 1]
+    values = values.astype(np.float64)
+    if not len(starts):
+        return values[:0]
+    missing = np.isnan(values)
+    if reducer in ('first', 'last'):
+        positions = np.arange(len(values))
+        if reducer == 'first':
+            picked = np.minimum.reduceat(np.where(missing, len(values), positions), starts)
+        else:
+            picked = np.maximum.reduceat(np.where(missing, -1, positions), starts)
+        found = (picked >= 0) & (picked < len(values))
+        return np.where(found, values[np.clip(picked, 0, len(values) - 1)], np.nan)
+    if reducer == 'max':
+        return np.fmax.reduceat(values, starts)
+    if reducer == 'min':
+        return np.fmin.reduceat(values, starts)
+    if reducer == 'sum':
+        return np.add.reduceat(np.where(missing, 0., values), starts)
+    weights = np.where(missing, 0., weights)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.add.reduceat(np.where(missing, 0., values) * weights, starts) / np.add.reduceat(weights, starts)
@@ -0,0 +1,79 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def bin_2d(x, y, weights, shape, reduce='mean', x_gap=None):
+    """
+    Aggregate weights on a grid of x buckets × y buckets with a weighted bincount, so that the cost is linear in the
+    number of rows and the size of the grid is bounded by shape, whatever the number of distinct x and y values.
+    An axis with fewer distinct values than buckets keeps one bucket per value, so that small windows are exact.
+    Each bucket is labelled by the largest value it contains, an actual value of the data. Empty buckets are dropped.
+    :param x: x values (e.g. nanosEpoch), rows where x, y or weights are NaN are ignored
+    :param y: y values (e.g. tradePx)
+    :param weights: values aggregated in each cell (e.g. tradeSz)
+    :param shape: maximum number of (x, y) buckets
+    :param reduce: 'mean' or 'sum' of the weights of each cell
+    :param x_gap: longest gap between x values bucketed at its width, see _buckets
+    :return: z as a 2D array of y buckets × x buckets (NaN for empty cells), x labels, y labels
+    """
+    x, y, weights = np.asarray(x), np.asarray(y), np.asarray(weights, dtype=np.float64)
+    valid = ~(pd.isna(x) | pd.isna(y) | np.isnan(weights))
+    if not valid.all():
+        x, y, weights = x[valid], y[valid], weights[valid]
+
+    x_codes, x_labels = _buckets(x, shape[0], x_gap)
+    y_codes, y_labels = _buckets(y, shape[1])
+    cells = y_codes * len(x_labels) + x_codes
+    size = len(x_labels) * len(y_labels)
+    sums = np.bincount(cells, weights, minlength=size).reshape(len(y_labels), len(x_labels))
+    counts = np.bincount(cells, minlength=size).reshape(len(y_labels), len(x_labels))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = sums / counts if reduce == 'mean' else sums
+    z[counts == 0] = np.nan
+    logger.info(f"Binned {len(weights)} rows on a {len(y_labels)} x {len(x_labels)} grid")
+    return z, x_labels, y_labels
+
+
+def _buckets(values, max_buckets, max_gap=None):
+    """
+    :param values: values to bucket
+    :param max_buckets: maximum number of buckets
+    :param max_gap: gaps between consecutive values longer than this count as this long (e.g. the nights between the
+    sessions of a multi-day window), so that the buckets cover the populated ranges rather than the whole span
+    :return: bucket of each value (0 to the number of non-empty buckets), label of each non-empty bucket
+    """
+    codes, levels = pd.factorize(values, sort=True)
+    if len(levels) <= max_buckets:
+        return codes, np.asarray(levels)
+
+    # equal width buckets between the min and the max, computed on the distinct values only
+    levels = np.asarray(levels)
+    positions = levels.astype(np.float64)
+    if max_gap is not None:
+        positions = np.cumsum(np.minimum(np.diff(positions, prepend=positions[0]), max_gap))
+    low, high = positions[0], positions[-1]
+    level_buckets = np.minimum(((positions - low) / (high - low) * max_buckets).astype(np.int64), max_buckets - 1)
+    # levels are sorted, so the last level of each non-empty bucket is its largest value
+    last = np.flatnonzero(np.diff(level_buckets, append=max_buckets))
+    _, level_buckets = np.unique(level_buckets, return_inverse=True)
+    return level_buckets[codes], levels[last]
+
+
+def fill_levels(z, backward=False):
+    """
+    Fill the empty cells of each column of a grid with the previous non-empty cell of the column, the equivalent of
+    DataFrame.fillna(method='ffill') on a 2D array.
+    :param z: 2D array of rows × columns, NaN for empty cells
+    :param backward: fill with the next non-empty cell instead (bfill)
+    :return: filled copy of z, cells with no previous (or next) non-empty cell stay NaN
+    """
+    if backward:
+        return fill_levels(z[::-1])[::-1]
+    rows = np.where(np.isnan(z), 0, np.arange(len(z))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return z[rows, np.arange(z.shape[1])]
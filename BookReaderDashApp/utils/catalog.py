@@ -0,0 +1,147 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from settings import DATA_DIR, CACHE_DIR, CATALOG_FILE, DATA_FILES
+from models import TopBookReader
+from utils.data_workflow import READERS, NANOS_PER_DAY, is_cache_fresh
+
+# files loaded concurrently update the manifest one at a time
+manifest_lock = threading.Lock()
+
+
+def scan_catalog():
+    """
+    Catalog of the data files of DATA_DIR (restricted to DATA_FILES if set), without parsing any of them.
+    Files are described by the manifest of the catalog when it is up to date, by their disk cache otherwise, or only
+    by their size until they are loaded (see update_catalog).
+    :return: dict from file name to its description, sorted by name
+    """
+    # the manifest is not updated by a loaded file between its reading and its writing
+    with manifest_lock:
+        manifest = read_manifest()
+        catalog = {}
+        for path in sorted(DATA_DIR.iterdir()):
+            if path.suffix not in READERS or DATA_FILES is not None and path.name not in DATA_FILES:
+                continue
+            stat = path.stat()
+            entry = manifest.get(path.name)
+            if entry is None or (entry['size'], entry['mtime_ns']) != (stat.st_size, stat.st_mtime_ns):
+                if not is_supported(path):
+                    continue
+                entry = describe_cache(path.name) or {'source': path.name, 'size': stat.st_size,
+                                                      'mtime_ns': stat.st_mtime_ns}
+            catalog[path.name] = entry
+
+        if catalog != manifest:
+            write_manifest(catalog)
+    return catalog
+
+
+def update_catalog(file, df):
+    """
+    Describe a loaded file in the manifest of the catalog
+    :param file: data file name, relative to DATA_DIR
+    :param df: its data, sorted by `msuk` then `nanosEpoch`
+    :return: the description of the file
+    """
+    description = describe(file, df)
+    with manifest_lock:
+        manifest = read_manifest()
+        manifest[file] = description
+        write_manifest(manifest)
+    return description
+
+
+def describe(file, df):
+    """
+    :param file: data file name, relative to DATA_DIR
+    :param df: its data, with at least `nanosEpoch` and a categorical `msuk`
+    :return: description of the file: size and mtime of the source, number of rows, time range (nanosEpoch), dates
+    present and number of rows of each msuk
+    """
+    stat = DATA_DIR.joinpath(file).stat()
+    nanos = df['nanosEpoch'].values
+    days = np.unique(nanos // NANOS_PER_DAY) * NANOS_PER_DAY
+    msuks = df['msuk'].value_counts(sort=False)
+    return {'source': file, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'rows': len(df),
+            'start': int(nanos.min()) if len(nanos) else None, 'end': int(nanos.max()) if len(nanos) else None,
+            'dates': [str(day.date()) for day in pd.to_datetime(days)],
+            'msuks': [[msuk.item() if hasattr(msuk, 'item') else msuk, int(rows)]
+                      for msuk, rows in msuks.items() if rows]}
+
+
+def describe_cache(file):
+    """
+    Describe a file from its disk cache, reading only its time and msuk columns
+    :param file: data file name, relative to DATA_DIR
+    :return: description of the file, None if it has no fresh cache
+    """
+    name, extension = os.path.splitext(file)
+    reader, cache_path = READERS[extension], CACHE_DIR.joinpath(name)
+    if not is_cache_fresh(file, reader.metadata(cache_path)):
+        return None
+    return describe(file, reader.deserialize(cache_path, columns=['nanosEpoch', 'msuk'], mmap=True))
+
+
+def is_supported(path):
+    """
+    :param path: data file
+    :return: whether a reader can load the file, from the header of csv files (line files are not checked)
+    """
+    if path.suffix != '.csv':
+        return True
+    with open(path, mode='r') as f:
+        header = f.readline().strip().split(',')
+    try:
+        TopBookReader._check_file(header)
+    except RuntimeError:
+        return False
+    return True
+
+
+def msuk_options(entry):
+    """
+    :param entry: description of a file in the catalog
+    :return: dropdown options of its msuks, as Dataset.msuk_options, empty if the file was never loaded
+    """
+    return [{'label': f'{msuk} ({rows:,} rows)', 'value': msuk} for msuk, rows in entry.get('msuks', [])]
+
+
+def file_options(catalog):
+    """
+    :param catalog: catalog as returned by scan_catalog
+    :return: dropdown options of the files, with their size and number of rows when known
+    """
+    options = []
+    for file, entry in catalog.items():
+        details = [f"{entry['size'] / 1024 ** 2:,.1f} MB"] + ([f"{entry['rows']:,} rows"] if 'rows' in entry else [])
+        options.append({'label': f"{file} ({', '.join(details)})", 'value': file})
+    return options
+
+
+def read_manifest():
+    """
+    :return: manifest of the catalog, from file name to description, empty if there is none
+    """
+    try:
+        with open(CATALOG_FILE, mode='r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_manifest(manifest):
+    """
+    Write the manifest of the catalog atomically, so that concurrent readers see the previous or the new one. Writers
+    of the same process hold manifest_lock, so that they don't overwrite each other's descriptions.
+    :param manifest: from file name to description
+    """
+    CATALOG_FILE.parent.mkdir(parents=True, exist_ok=True)
+    temporary = CATALOG_FILE.with_name(f'{CATALOG_FILE.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    with open(temporary, mode='w') as f:
+        json.dump(dict(sorted(manifest.items())), f, indent=1)
+    os.replace(temporary, CATALOG_FILE)
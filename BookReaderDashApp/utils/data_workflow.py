@@ -1,11 +1,25 @@
 import os
 
-from settings import CACHE_DIR
-from models import BookReader, TopBookReader
+from settings import DATA_DIR, CACHE_DIR, CACHE_MMAP, CACHE_HASH, CACHE_TMP_AGE, COMPACT_NUMERICS, \
+    GLOBAL_STORE_BUDGET, PARTITION_STORE_BUDGET, FILTERED_STORE_BUDGET, TABLE_STORE_BUDGET, BOOK_STORE_BUDGET, \
+    FEATURE_STORE_BUDGET, BAR_STORE_BUDGET, BAR_RESOLUTIONS, FIGURE_CACHE_DIR
+from models import BookReader, TopBookReader, Dataset, OrderBook
+from utils.memory_cache import memory_cache
+from utils.table import table_rows, table_page
+from utils.features import book_features
+from utils.bars import build_pyramid
+from utils.settings import FIGURE_VERSION, POINT_BUDGETS, DOWNSAMPLING_METHOD, HEATMAP_BINS, BOOK_DEPTH, \
+    FEATURE_LEVELS, HEATMAP_GAP
 # from utils import TIME_RANGES
 
 import re
-from functools import lru_cache
+import json
+import time
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+from collections import Counter
 from datetime import datetime as dt
 
 APP_INPUTS = ['file_path', 'date', 'msuk', 'use_cache', 'hour', 'minute', 'second', 'micros']
@@ -15,7 +29,14 @@ TIME_RANGES = {
     'second': {'min': 0, 'max': 60},
     'microsecond': {'min': 0, 'max': 1000000}
 }
-def load_data(file, use_cache=False):
+READERS = {'.data': BookReader, '.csv': TopBookReader}
+NANOS_PER_UNIT = {'hour': 3600 * 10 ** 9, 'minute': 60 * 10 ** 9, 'second': 10 ** 9, 'microsecond': 10 ** 3}
+NANOS_PER_DAY = 24 * NANOS_PER_UNIT['hour']
+# columns of the level updates replayed by models.OrderBook
+BOOK_COLUMNS = ['nanosEpoch', 'direction', 'tradePx', 'tradeSz']
+
+
+def load_data(file, use_cache=False, columns=None, mmap=False, downcast=False, progress=None):
     """
     Load data file from supported formats.
 
@@ -26,7 +47,20 @@ def load_data(file, use_cache=False):
 
     use_cache : bool
         if true, try to recover data from local cache.
-        if false or the cache doesn't exist, invalidate the cache.
+        if false or the cache doesn't exist or is stale (see `is_cache_fresh`), invalidate the cache.
+
+    columns : iterable of str, optional
+        columns to return, all of them if None. Only these columns are read from the cache.
+
+    mmap : bool
+        if true, numeric columns are memory mapped from the cache rather than held in memory.
+        freshly parsed data is re-opened from the cache it was just written to.
+
+    downcast : bool
+        if true, prices are stored as float32 and sizes as int32, see DataReader.downcast
+
+    progress : callable, optional
+        called with the number of bytes parsed since its previous call, when the file is parsed.
 
     Returns
     -------
@@ -39,65 +73,324 @@ def load_data(file, use_cache=False):
     # cache now is in gitignore, this creates the directory if it doesn't exist
     CACHE_DIR.mkdir(parents=False, exist_ok=True)
 
-    pkl_path = CACHE_DIR.joinpath(filename + ".pkl")
+    cache_path = CACHE_DIR.joinpath(filename)
+    reader = READERS[file_extension]
 
-    if file_extension == '.data':
-        reader = BookReader
+    if use_cache and is_cache_fresh(file, reader.metadata(cache_path), downcast=downcast):
+        df = reader.deserialize(cache_path, columns=columns, mmap=mmap)
     else:
-        reader = TopBookReader
+        df = reader.load(DATA_DIR.joinpath(file), progress=progress)
+        if downcast:
+            reader.downcast(df)
+        reader.serialize(df, cache_path, metadata=source_manifest(file, content_hash=CACHE_HASH, downcast=downcast))
+        if mmap:
+            df = reader.deserialize(cache_path, columns=columns, mmap=True)
+        elif columns is not None:
+            df = df[list(columns)]
 
-    if use_cache and pkl_path.exists():
-        df = reader.deserialize(pkl_path)
+    return df
+
+def load_partition(file, msuk, date=None, columns=None, mmap=False, downcast=False):
+    """
+    Load the rows of one msuk on one date (or on all its dates) from the cache of a data file, reading only them (see
+    DataReader.partitions).
+
+    Parameters
+    ----------
+    file : str
+        data file name, relative to DATA_DIR.
+
+    msuk : int or str
+        instrument identifier.
+
+    date : str, optional
+        date as 'YYYY-MM-DD', all the dates of the msuk if None (its partitions are contiguous rows).
+
+    columns : iterable of str, optional
+        columns to return, all of them if None.
+
+    mmap : bool
+        if true, numeric columns are memory mapped from the cache rather than held in memory.
+
+    downcast : bool
+        whether the cached data should be downcast, see load_data
+
+    Returns
+    -------
+    pandas.DataFrame or None
+        rows of the partition sorted by time, empty if the msuk has no data that day. None if the file has no fresh
+        partitioned cache, it is then loaded with load_data.
+    """
+    filename, file_extension = os.path.splitext(file)
+    cache_path = CACHE_DIR.joinpath(filename)
+    reader = READERS[file_extension]
+    partitions = reader.partitions(cache_path)
+    if partitions is None or not is_cache_fresh(file, reader.metadata(cache_path), downcast=downcast):
+        return None
+    if date is None:
+        rows = [partition for (partition_msuk, _), partition in partitions.items() if partition_msuk == msuk]
+        rows = (min(start for start, _ in rows), max(stop for _, stop in rows)) if rows else (0, 0)
     else:
-        df = reader.load('data/' + file)
-        reader.serialize(df, pkl_path)
+        rows = partitions.get((msuk, date), (0, 0))
+    return reader.deserialize(cache_path, columns=columns, mmap=mmap, rows=rows)
 
-    return df
 
-@lru_cache(maxsize=None)
+def is_partitioned(file, downcast=False):
+    """
+    :param file: data file name, relative to DATA_DIR
+    :param downcast: whether the cached data should be downcast
+    :return: True if partitions of the file can be read from its cache, see load_partition
+    """
+    cache_path = CACHE_DIR.joinpath(os.path.splitext(file)[0])
+    reader = READERS.get(os.path.splitext(file)[1])
+    return reader is not None and reader.partitions(cache_path) is not None and \
+        is_cache_fresh(file, reader.metadata(cache_path), downcast=downcast)
+
+
+def source_manifest(file, content_hash=False, downcast=False):
+    """
+    Describe a data file and the reader loading it, to be stored along its cached data.
+
+    Parameters
+    ----------
+    file : str
+        data file name, relative to DATA_DIR.
+
+    content_hash : bool
+        if true, include a sha256 of the file content.
+
+    downcast : bool
+        whether the cached data is downcast.
+
+    Returns
+    -------
+    dict
+    """
+    path = DATA_DIR.joinpath(file)
+    reader = READERS[os.path.splitext(file)[1]]
+    stat = path.stat()
+    manifest = {'source': file, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                'reader': reader.__name__, 'version': reader._version, 'downcast': downcast}
+    if content_hash:
+        manifest['sha256'] = file_hash(path)
+    return manifest
+
+
+def file_hash(path, block_size=1 << 20):
+    """
+    :param path: file to hash
+    :param block_size: bytes read at once
+    :return: hex sha256 of the file content
+    """
+    sha = hashlib.sha256()
+    with open(path, mode='rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def is_cache_fresh(file, cached, downcast=None):
+    """
+    Check cached data against the current state of its source file.
+    The cache is fresh if it was written by the current reader version for a file of the same size and mtime, or,
+    when the mtime changed, of the same content hash (only if a hash was stored).
+
+    :param file: data file name, relative to DATA_DIR
+    :param cached: manifest stored with the cached data, None if there is none
+    :param downcast: whether the cached data should be downcast, any if None
+    :return: True if the cached data can be used
+    """
+    if not cached or not DATA_DIR.joinpath(file).exists():
+        return False
+    manifest = source_manifest(file, downcast=cached.get('downcast') if downcast is None else downcast)
+    if any(cached.get(key) != manifest[key] for key in ('source', 'reader', 'version', 'downcast', 'size')):
+        return False
+    if cached.get('mtime_ns') == manifest['mtime_ns']:
+        return True
+    return 'sha256' in cached and cached['sha256'] == file_hash(DATA_DIR.joinpath(file))
+
+
+def clean_cache():
+    """
+    Remove stale entries from CACHE_DIR: data and bars whose source file is gone or changed, abandoned writes (see
+    is_abandoned_write) and legacy pickle files.
+    :return: names of the removed entries
+    """
+    removed = []
+    if not CACHE_DIR.exists():
+        return removed
+    for entry in CACHE_DIR.iterdir():
+        if entry == FIGURE_CACHE_DIR:
+            # keys of the figure cache are invalidated by the state of their source, see figure_key
+            continue
+        if entry.is_dir():
+            if entry.suffix == '.tmp':
+                # possibly being written by another process
+                if not is_abandoned_write(entry):
+                    continue
+                shutil.rmtree(entry, ignore_errors=True)
+                removed.append(entry.name)
+                continue
+            cached = BookReader.metadata(entry)
+            if cached and is_cache_fresh(cached.get('source', ''), cached):
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+        elif entry.suffix == '.pkl':
+            entry.unlink()
+        else:
+            continue
+        removed.append(entry.name)
+    return removed
+
+
+def is_abandoned_write(path):
+    """
+    :param path: temporary directory of a cache write, `<name>.<pid>.tmp` (see DataReader.serialize)
+    :return: whether the write was interrupted: its process is gone, or it is older than CACHE_TMP_AGE
+    """
+    if time.time() - path.stat().st_mtime > CACHE_TMP_AGE:
+        return True
+    pid = path.stem.rsplit('.', 1)[-1]
+    if not pid.isdigit():
+        return True
+    if os.name == 'nt':
+        # signal 0 does not test a process on Windows, only the age applies
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        # running as another user
+        return False
+    return False
+
+
+# bytes parsed by the ongoing or last load of each file, see loading_progress
+parsed_bytes = Counter()
+
+
+def loading_progress(file_path):
+    """
+    :param file_path: file being loaded by global_store
+    :return: fraction of the file parsed by its ongoing or last load, 0 if it is read from the cache
+    """
+    size = DATA_DIR.joinpath(file_path).stat().st_size
+    return min(parsed_bytes[file_path] / size, 1.) if size else 1.
+
+
+@memory_cache(GLOBAL_STORE_BUDGET)
 def global_store(file_path, use_cache):
     """
-    Main cached function to load file from disk
+    Main cached function to load file from disk, the least recently used files are evicted beyond GLOBAL_STORE_BUDGET
     :param file_path: file to load
     :param use_cache: if using cached data to load from disk
-    :return:
+    :return: the loaded dataset and its msuks options to display
     """
-    df = load_data(file_path, use_cache=use_cache)
-    msuks = df['msuk'].unique()
-    options = [{'label': msuk, 'value': msuk} for msuk in msuks]
-    return df, options
+    parsed_bytes[file_path] = 0
+
+    def progress(parsed):
+        parsed_bytes[file_path] += parsed
+
+    df = load_data(file_path, use_cache=use_cache, mmap=CACHE_MMAP, downcast=COMPACT_NUMERICS, progress=progress)
+    dataset = Dataset(df)
+    return dataset, dataset.msuk_options()
 
 def get_global_data(*args):
     """
     Intermediate function to load file from disk for clarity
     :param args: file_path abd use_cache
-    :return: data from disk as a dataframe and unique msuks to display
+    :return: data from disk as a Dataset and unique msuks to display
     """
     data, msuks = global_store(*args)
     return data, msuks
 
 
-@lru_cache(maxsize=None)
-def filtered_data_store(**kwargs):
+@memory_cache(PARTITION_STORE_BUDGET)
+def partition_store(file_path, use_cache, msuk, date, source):
+    """
+    One msuk on one date of a file which is not loaded, read from its cache, bounded by PARTITION_STORE_BUDGET.
+    Called with keyword arguments, so that the partitions of a followed file are invalidated as it grows
+    (see utils.live)
+    :param file_path: file with a fresh partitioned cache, see is_partitioned
+    :param use_cache: if using cached data to load from disk
+    :param msuk: instrument identifier
+    :param date: date as 'YYYY-MM-DD'
+    :param source: size and mtime of the file, so that the partitions of a changed file are read again
+    :return: the partition as a Dataset, None if the cache is no longer fresh
     """
-    Main function to filter and store data from global_store
+    df = load_partition(file_path, msuk, date, mmap=CACHE_MMAP, downcast=COMPACT_NUMERICS)
+    return Dataset(df.reset_index(drop=True)) if df is not None else None
+
+
+def get_window_dataset(**kwargs):
+    """
+    Smallest dataset holding the window selected by the user: the partition of the msuk and date from the cache when
+    both are selected and the file is not loaded, so that one day of one instrument is read without the whole file
+    :param kwargs: all the arguments from APP_INPUTS, given by user on the webpage
+    :return: a Dataset
+    """
+    file_path, use_cache, msuk, date = (kwargs.get(key) for key in ('file_path', 'use_cache', 'msuk', 'date'))
+    if reads_partition(**kwargs):
+        stat = DATA_DIR.joinpath(file_path).stat()
+        dataset = partition_store(file_path=file_path, use_cache=use_cache, msuk=msuk,
+                                  date=re.split(r"[T ]", date)[0], source=(stat.st_size, stat.st_mtime_ns))
+        if dataset is not None:
+            return dataset
+    dataset, _ = get_global_data(file_path, use_cache)
+    return dataset
+
+
+def reads_partition(**kwargs):
+    """
+    :param kwargs: all the arguments from APP_INPUTS, given by user on the webpage
+    :return: whether the window is read from a partition of the cache rather than from the loaded file, see
+    get_window_dataset
+    """
+    file_path, use_cache, msuk, date = (kwargs.get(key) for key in ('file_path', 'use_cache', 'msuk', 'date'))
+    return bool(use_cache) and msuk is not None and date is not None \
+        and not global_store.contains(file_path, use_cache) and is_partitioned(file_path, downcast=COMPACT_NUMERICS)
+
+
+@memory_cache(FILTERED_STORE_BUDGET)
+def filtered_data_store(quotes=False, **kwargs):
+    """
+    Main function to filter and store data from global_store (or a partition of the cache, see get_window_dataset),
+    bounded by FILTERED_STORE_BUDGET
+    :param quotes: filter the best quotes table of the data instead, one row per book update (see Dataset.best_quotes)
     :param kwargs: all the arguments from APP_INPUTS, given by user on the webpage
     :return: filtered data as a dataframe
     """
-    file_path, date, msuk, use_cache = [kwargs.get(kwarg) for kwarg in APP_INPUTS[:4]]
+    dataset = get_window_dataset(**kwargs)
+    return filter_window(dataset.quotes if quotes else dataset, **kwargs)
+
+
+def filter_window(dataset, **kwargs):
+    """
+    Rows of a dataset within the date, msuk and time window selected by the user
+    :param dataset: a Dataset, e.g. loaded by global_store or the new entries of a followed file
+    :param kwargs: all the arguments from APP_INPUTS, as for filtered_data_store
+    :return: filtered data as a dataframe
+    """
+    date, msuk = kwargs.get('date'), kwargs.get('msuk')
+    nanos = dataset.df['nanosEpoch'].values
+    args = [{'max': kwargs.get(f'{types}max'), 'min': kwargs.get(f'{types}min')} for types in APP_INPUTS[4:]]
+    start, end = window_offsets(args)
 
-    filtered_df, _ = get_global_data(file_path, use_cache)
-    if msuk is not None:
-        filtered_df = filtered_df[(filtered_df.msuk == msuk)]
     if date is not None:
         date = dt.strptime(re.split(r"[T ]", date)[0], '%Y-%m-%d')
-        date = dt.date(date)
-        filtered_df = filtered_df[(filtered_df.date == date)]
-    args = [{'max': kwargs.get(f'{types}max'), 'min': kwargs.get(f'{types}min')} for types in APP_INPUTS[4:]]
-    filtered_df = filter_attr(filtered_df, 'hour', args[0])
-    filtered_df = filter_attr(filtered_df, 'minute', args[1])
-    filtered_df = filter_attr(filtered_df, 'second', args[2])
-    filtered_df = filter_attr(filtered_df, 'microsecond', args[3])
+        days = [pd.Timestamp(date).value]
+    elif len(nanos):
+        days = range(nanos.min() // NANOS_PER_DAY * NANOS_PER_DAY, nanos.max() + 1, NANOS_PER_DAY)
+    else:
+        days = []
+
+    # for a single msuk and date, the window is a zero-copy slice
+    slices = [dataset.window(day + start, day + end, msuk) for day in days]
+    if len(slices) == 1:
+        filtered_df = slices[0]
+    else:
+        filtered_df = pd.concat(slices) if slices else dataset.df.iloc[:0]
 
     return filtered_df
 
@@ -113,6 +406,275 @@ def get_filtered_data(*args):
     return data
 
 
+def get_quote_data(*args):
+    """
+    Best quotes of the filtered data, for the charts of the top of the book
+    :param args: all the inputs given by callbacks
+    :return: one row per book update of the filtered data, as a dataframe
+    """
+    kwargs = args_to_hashable_kwargs(*args)
+    return filtered_data_store(quotes=True, **kwargs)
+
+
+@memory_cache(TABLE_STORE_BUDGET)
+def table_rows_store(sort_by, filter_query, **kwargs):
+    """
+    Rows of the filtered data kept by the filter query of the table, in the order of its sort, so that changing page
+    does not filter and sort again
+    :param sort_by: tuple of (column_id, direction) pairs
+    :param filter_query: filter_query of the table
+    :param kwargs: all the arguments from APP_INPUTS, as for filtered_data_store
+    :return: array of row positions in the filtered data
+    """
+    return table_rows(filtered_data_store(**kwargs), sort_by, filter_query)
+
+
+def get_table_page(page_current, page_size, sort_by, filter_query, columns, *args):
+    """
+    One page of the data table, filtered and sorted on the server
+    :param page_current: page number, from 0
+    :param page_size: number of rows per page
+    :param sort_by: sort_by of the table, a list of {'column_id', 'direction'} dicts
+    :param filter_query: filter_query of the table
+    :param columns: columns of the table
+    :param args: all the inputs given by callbacks
+    :return: records of the page and number of rows after filtering
+    """
+    kwargs = args_to_hashable_kwargs(*args)
+    sort_by = tuple((sort['column_id'], sort['direction']) for sort in sort_by or [])
+    rows = table_rows_store(sort_by, filter_query or '', **kwargs)
+    return table_page(filtered_data_store(**kwargs), rows, page_current or 0, page_size, columns), len(rows)
+
+
+def get_zoomed_data(x_range, *args, quotes=False):
+    """
+    Filtered data restricted to the visible range of a zoomed graph
+    :param x_range: start and end nanosEpoch of the visible range, the end excluded, None for the whole window
+    :param args: all the inputs given by callbacks
+    :param quotes: restrict the best quotes of the filtered data instead
+    :return: filtered data as a dataframe, a zero-copy slice of the filtered data when zoomed
+    """
+    data = get_quote_data(*args) if quotes else get_filtered_data(*args)
+    if x_range is not None:
+        data = Dataset.time_slice(data, *x_range)
+    return data
+
+
+@memory_cache(FEATURE_STORE_BUDGET)
+def feature_store(file_path, use_cache, msuk=None):
+    """
+    Order book features of every book update of a loaded file, computed once over the whole file and bounded by
+    FEATURE_STORE_BUDGET. With an msuk, the features of its updates only, from its rows read from the partitioned
+    cache: the file is not loaded. Called with keyword arguments, so that the features of a followed file are
+    invalidated as it grows (see utils.live)
+    :param file_path: file to load
+    :param use_cache: if using cached data to load from disk
+    :param msuk: instrument identifier, None for the whole file
+    :return: dataframe aligned with the best quotes table of the dataset, see utils.features.book_features. With an
+    msuk, the features of its updates with their `nanosEpoch`, None if the file has no fresh partitioned cache
+    """
+    if msuk is None:
+        dataset, _ = get_global_data(file_path, use_cache)
+        return book_features(dataset)
+    df = load_partition(file_path, msuk, mmap=CACHE_MMAP, downcast=COMPACT_NUMERICS)
+    if df is None:
+        return None
+    dataset = Dataset(df.reset_index(drop=True))
+    features = book_features(dataset)
+    features['nanosEpoch'] = dataset.quotes.df['nanosEpoch'].values
+    return features
+
+
+def get_feature_data(x_range, feature, *args):
+    """
+    Features of the best quotes over the filtered (or zoomed) window, either columns of the best quotes table or order
+    book features, sliced from feature_store rather than computed for the window
+    :param x_range: start and end nanosEpoch of the visible range, the end excluded, None for the whole window
+    :param feature: column of the best quotes table or of utils.features.book_features, or a list of them
+    :param args: all the inputs given by callbacks
+    :return: dataframe with `datetime`, `nanosEpoch` and the features, one row per book update of the window
+    """
+    columns = [feature] if isinstance(feature, str) else list(feature)
+    quotes = get_zoomed_data(x_range, *args, quotes=True)
+    if all(column in quotes for column in columns):
+        return quotes
+    kwargs = args_to_hashable_kwargs(*args)
+    if reads_partition(**kwargs):
+        # the book of the msuk is replayed from its rows of the cache, an msuk has one update per timestamp
+        store = feature_store(file_path=kwargs['file_path'], use_cache=kwargs['use_cache'], msuk=kwargs['msuk'])
+        if store is not None:
+            positions = np.searchsorted(store['nanosEpoch'].values, quotes['nanosEpoch'].values)
+            return pd.DataFrame({'datetime': quotes['datetime'].values, 'nanosEpoch': quotes['nanosEpoch'].values,
+                                 **{column: store[column].values[positions] for column in columns}},
+                                index=quotes.index)
+    # features are aligned with the best quotes of the whole file, not of a partition
+    dataset, _ = get_global_data(kwargs['file_path'], kwargs['use_cache'])
+    quotes = filter_window(dataset.quotes, **kwargs)
+    if x_range is not None:
+        quotes = Dataset.time_slice(quotes, *x_range)
+    store = feature_store(file_path=kwargs['file_path'], use_cache=kwargs['use_cache'])
+    # windows of a single msuk and date are ranges of the best quotes table
+    index = quotes.index
+    rows = slice(index.start, index.stop) if isinstance(index, pd.RangeIndex) and index.step == 1 else index.values
+    return pd.DataFrame({'datetime': quotes['datetime'].values, 'nanosEpoch': quotes['nanosEpoch'].values,
+                         **{column: store[column].values[rows] for column in columns}}, index=index)
+
+
+def load_bars(file, use_cache=False):
+    """
+    Bars of a data file at each of BAR_RESOLUTIONS, built from its loaded data and cached on disk next to it.
+
+    Parameters
+    ----------
+    file : str
+        data file name, relative to DATA_DIR.
+
+    use_cache : bool
+        if true, read the bars from the cache when they are fresh for the current state of the file.
+
+    Returns
+    -------
+    dict
+        from label to bars as a pandas.DataFrame, from the finest, see utils.bars.build_pyramid
+    """
+    name = os.path.splitext(file)[0]
+    paths = {label: CACHE_DIR.joinpath(f'{name}.bars.{label}') for label in BAR_RESOLUTIONS}
+    if use_cache and all(is_bars_cache_fresh(file, BookReader.metadata(paths[label]), resolution)
+                         for label, resolution in BAR_RESOLUTIONS.items()):
+        return {label: BookReader.deserialize(path, mmap=CACHE_MMAP, validate=False) for label, path in paths.items()}
+
+    dataset, _ = get_global_data(file, use_cache)
+    pyramid = build_pyramid(dataset, BAR_RESOLUTIONS)
+    manifest = source_manifest(file, content_hash=CACHE_HASH, downcast=COMPACT_NUMERICS)
+    for label, bars in pyramid.items():
+        metadata = dict(manifest, resolution=BAR_RESOLUTIONS[label])
+        BookReader.serialize(bars, paths[label], metadata=metadata, validate=False)
+    return pyramid
+
+
+def is_bars_cache_fresh(file, cached, resolution):
+    """
+    :param file: data file name, relative to DATA_DIR
+    :param cached: manifest stored with cached bars, None if there is none
+    :param resolution: bar length in nanoseconds
+    :return: True if the cached bars were built from the current state of the file at this resolution
+    """
+    return is_cache_fresh(file, cached, downcast=COMPACT_NUMERICS) and cached.get('resolution') == resolution
+
+
+@memory_cache(BAR_STORE_BUDGET)
+def bar_store(file_path, use_cache):
+    """
+    Bars of a loaded file, bounded by BAR_STORE_BUDGET. Called with keyword arguments, so that the bars of a followed
+    file are invalidated as it grows (see utils.live)
+    :param file_path: file to load
+    :param use_cache: if using cached data to load from disk
+    :return: from label to bars as a Dataset, from the finest, see load_bars
+    """
+    return {label: Dataset(bars, quotes=False) for label, bars in load_bars(file_path, use_cache).items()}
+
+
+def get_plot_data(x_range, max_points, *args):
+    """
+    Data of the line charts over the filtered (or zoomed) window: the bars of the coarsest resolution which still has
+    max_points bars in the window, so that wide windows cost a few thousand rows, or the best quotes of the window when
+    even the finest bars would not fill the graph
+    :param x_range: start and end nanosEpoch of the visible range, the end excluded, None for the whole window
+    :param max_points: number of points of the graph, see POINT_BUDGETS, None to plot the best quotes
+    :param args: all the inputs given by callbacks
+    :return: bars or best quotes as a dataframe, both with `datetime` and the best quotes columns
+    """
+    if max_points is not None:
+        kwargs = args_to_hashable_kwargs(*args)
+        pyramid = bar_store(file_path=kwargs['file_path'], use_cache=kwargs['use_cache'])
+        for bars in reversed(list(pyramid.values())):
+            window = filter_window(bars, **kwargs)
+            if x_range is not None:
+                window = Dataset.time_slice(window, *x_range)
+            if len(window) >= max_points:
+                return window
+    return get_zoomed_data(x_range, *args, quotes=True)
+
+
+@memory_cache(BOOK_STORE_BUDGET)
+def book_store(file_path, use_cache, msuk):
+    """
+    Full depth book of an msuk, replayed once with its checkpoints, bounded by BOOK_STORE_BUDGET. The rows of the msuk
+    are read from the partitioned cache when the file is not loaded, the whole file is never loaded for its book.
+    Called with keyword arguments, so that the books of a followed file are invalidated as it grows (see utils.live)
+    :param file_path: line data file
+    :param use_cache: if using cached data to load from disk
+    :param msuk: instrument identifier
+    :return: a models.OrderBook
+    """
+    df = None
+    if use_cache and not global_store.contains(file_path, use_cache):
+        df = load_partition(file_path, msuk, columns=BOOK_COLUMNS, mmap=CACHE_MMAP, downcast=COMPACT_NUMERICS)
+    if df is None:
+        dataset, _ = get_global_data(file_path, use_cache)
+        df = dataset.partition(msuk)
+    return OrderBook(df)
+
+
+def get_book_levels(x_range, depth, samples, *args):
+    """
+    Best levels of the full depth book over the filtered (or zoomed) window, at evenly spaced times
+    :param x_range: start and end nanosEpoch of the visible range, the end excluded, None for the whole window
+    :param depth: number of levels on each side
+    :param samples: number of times
+    :param args: all the inputs given by callbacks
+    :return: the times and the levels at these times (see OrderBook.levels), None if the book cannot be replayed: top of
+    the book data, no msuk selected or an empty window
+    """
+    kwargs = args_to_hashable_kwargs(*args)
+    msuk = kwargs['msuk']
+    # only line data has level updates
+    if msuk is None or READERS[os.path.splitext(kwargs['file_path'])[1]] is not BookReader:
+        return None
+    nanos = get_zoomed_data(x_range, *args)['nanosEpoch'].values
+    if not len(nanos):
+        return None
+
+    book = book_store(file_path=kwargs['file_path'], use_cache=kwargs['use_cache'], msuk=msuk)
+    times = np.unique(np.linspace(nanos.min(), nanos.max(), samples).astype(np.int64))
+    return times, book.levels(times, depth)
+
+
+def zoom_range(relayout_data):
+    """
+    Visible x range of a graph from its relayoutData
+    :param relayout_data: relayoutData of a dcc.Graph
+    :return: start and end nanosEpoch of the visible range, the end excluded, None if the x axis is not zoomed
+    """
+    if not relayout_data or relayout_data.get('xaxis.autorange'):
+        return None
+    if 'xaxis.range[0]' in relayout_data and 'xaxis.range[1]' in relayout_data:
+        start, end = relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]']
+    elif 'xaxis.range' in relayout_data:
+        start, end = relayout_data['xaxis.range']
+    else:
+        return None
+    return pd.Timestamp(start).value, pd.Timestamp(end).value + 1
+
+
+def figure_key(name, *args, **params):
+    """
+    Canonical key of a figure, shared by all the processes serving the app
+    :param name: name of the figure
+    :param args: all the inputs given by callbacks, canonicalized by args_to_hashable_kwargs
+    :param params: parameters of the figure, e.g. feature, color scale or zoomed range
+    :return: hex digest of the figure, its parameters, the filters, the state of the source file and the version and
+    settings of the figures, so that the figures of a file which changed or built by other code are never served again
+    """
+    kwargs = args_to_hashable_kwargs(*args)
+    manifest = source_manifest(kwargs['file_path'], downcast=COMPACT_NUMERICS)
+    figures = dict(version=FIGURE_VERSION, point_budgets=POINT_BUDGETS, downsampling=DOWNSAMPLING_METHOD,
+                   bins=HEATMAP_BINS, gap=HEATMAP_GAP, bars=BAR_RESOLUTIONS, book_depth=BOOK_DEPTH,
+                   feature_levels=FEATURE_LEVELS)
+    key = json.dumps([name, params, kwargs, manifest, figures], sort_keys=True, default=str)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
 def args_to_hashable_kwargs(*args):
     """
     :param args: all the inputs given by callbacks
@@ -123,9 +685,27 @@ def args_to_hashable_kwargs(*args):
     kwargs.update({k: v for d in ranges for k, v in d.items()})
     return kwargs
 
-def filter_attr(df, attr, timerange):
-    if timerange is not None and timerange != TIME_RANGES[attr]:
-        min_value, max_value = timerange['min'], timerange['max']
-        return df[(df[attr] <= max_value) & (df[attr] >= min_value)]
-    else:
-        return df
+def window_offsets(timeranges):
+    """
+    Translate the time sliders into a time window within a day.
+    The window is contiguous because lower sliders cover their full range whenever a higher one is a range.
+    :param timeranges: {'min', 'max'} slider values for each of TIME_RANGES, None for the full range
+    :return: start and end of the window as nanoseconds since midnight, the end excluded
+    """
+    start, end = 0, NANOS_PER_UNIT['microsecond']
+    for attr, timerange in zip(TIME_RANGES, timerange_values(timeranges)):
+        # the max of the slider (e.g. 60 minutes) means up to the end of the higher unit
+        last = TIME_RANGES[attr]['max'] - 1
+        start += min(timerange['min'], last) * NANOS_PER_UNIT[attr]
+        end += min(timerange['max'], last) * NANOS_PER_UNIT[attr]
+    return start, end
+
+
+def timerange_values(timeranges):
+    """
+    :param timeranges: {'min', 'max'} slider values for each of TIME_RANGES, None for the full range
+    :return: the slider values with missing values replaced by the full range
+    """
+    full = list(TIME_RANGES.values())
+    return [full[i] if timerange is None or None in timerange.values() else timerange
+            for i, timerange in enumerate(timeranges)]
@@ -0,0 +1,85 @@
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def downsample(df, columns, max_points, method='lttb', x='datetime'):
+    """
+    Reduce the rows of a time series dataframe to a point budget before traces are built, keeping the shape of each
+    column. The rows kept for all the columns are shared, so that the traces of a figure stay aligned.
+    :param df: dataframe sorted by x
+    :param columns: columns plotted against x, each gets an equal share of the budget
+    :param max_points: point budget, no reduction if None
+    :param method: 'lttb' (Largest Triangle Three Buckets) or 'minmax' (min and max of each bucket)
+    :param x: column of the x axis
+    :return: the kept rows of df
+    """
+    if max_points is None or len(df) <= max_points:
+        return df
+    budget = max(max_points // len(columns), 3)
+    x_values = df[x].values
+    rows = np.unique(np.concatenate([DOWNSAMPLERS[method](x_values, df[column].values, budget)
+                                     for column in columns]))
+    logger.info(f"Downsampled {', '.join(columns)} with {method}: {len(df)} -> {len(rows)} points "
+                f"({len(df) / len(rows):.1f}x reduction)")
+    return df.iloc[rows]
+
+
+def lttb_indices(x, y, max_points):
+    """
+    Largest Triangle Three Buckets: in each bucket, keep the point forming the largest triangle with the point kept in
+    the previous bucket and the average of the next bucket
+    :param x: increasing x values
+    :param y: y values
+    :param max_points: number of points kept, at least 3
+    :return: indices of the kept points, increasing
+    """
+    n = len(x)
+    x, y = _as_float(x), _as_float(y)
+    # max_points - 2 buckets between the first and last points, which are always kept
+    edges = np.linspace(1, n - 1, max(max_points, 3) - 1).astype(np.int64)
+    indices = np.empty(len(edges) + 1, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+
+    previous = 0
+    for bucket in range(len(edges) - 1):
+        start, stop = edges[bucket], edges[bucket + 1]
+        next_stop = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x, next_y = x[stop:next_stop].mean(), y[stop:next_stop].mean()
+        areas = np.abs((x[previous] - next_x) * (y[start:stop] - y[previous])
+                       - (x[previous] - x[start:stop]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas)) if stop > start else previous
+        indices[bucket + 1] = previous
+    return np.unique(indices)
+
+
+def minmax_indices(x, y, max_points):
+    """
+    Min/max bucketing: keep the lowest and highest point of each bucket, so the extremes are exactly preserved
+    :param x: increasing x values
+    :param y: y values
+    :param max_points: number of points kept, two per bucket and the first and last points
+    :return: indices of the kept points, increasing
+    """
+    n = len(y)
+    buckets = max((max_points - 2) // 2, 1)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    bucket_of_row = np.repeat(np.arange(buckets), np.diff(edges))
+    # sorted by bucket then value, the first and last rows of each bucket are its min and max
+    order = np.lexsort((_as_float(y), bucket_of_row))
+    starts, stops = edges[:-1], edges[1:]
+    filled = stops > starts
+    kept = np.concatenate([[0, n - 1], order[starts[filled]], order[stops[filled] - 1]])
+    return np.unique(kept)
+
+
+def _as_float(values):
+    values = np.asarray(values)
+    if values.dtype.kind in 'mM':
+        values = values.view(np.int64)
+    return values.astype(np.float64)
+
+
+DOWNSAMPLERS = {'lttb': lttb_indices, 'minmax': minmax_indices}
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+from models import OrderBook
+from utils.settings import FEATURE_LEVELS
+
+
+def book_features(dataset, levels=FEATURE_LEVELS):
+    """
+    Order book features of each book update of a dataset, computed once over the whole dataset with column operations
+    :param dataset: a models.Dataset with its best quotes
+    :param levels: number of levels of the per level and cumulative depth imbalances
+    :return: dataframe aligned with the best quotes table (same index), see quote_features and level_features
+    """
+    quotes = dataset.quotes.df
+    return pd.concat([quote_features(quotes), level_features(dataset, levels)], axis=1)
+
+
+def quote_features(quotes):
+    """
+    Features of the best bid and ask of each update: normalized size imbalance (ask minus bid size over their sum, the
+    sign of the `size_imbalance` column), microprice and order flow imbalance
+    (OFI, the net order flow at the best quotes since the previous update of the msuk, as in Cont, Kukanov & Stoikov)
+    :param quotes: best quotes table, sorted by msuk then time
+    :return: dataframe with `imbalance`, `microprice`, `ofi` and `cumulative_ofi` (running sum of the OFI of the msuk)
+    """
+    bid_px, ask_px = quotes['bidPx'].values.astype(np.float64), quotes['askPx'].values.astype(np.float64)
+    bid_sz, ask_sz = quotes['bidSz'].values.astype(np.float64), quotes['askSz'].values.astype(np.float64)
+    depth = bid_sz + ask_sz
+    with np.errstate(invalid='ignore', divide='ignore'):
+        imbalance = (ask_sz - bid_sz) / depth
+        microprice = (bid_px * ask_sz + ask_px * bid_sz) / depth
+
+    ofi = np.zeros(len(quotes))
+    if len(quotes) > 1:
+        ofi[1:] = (bid_px[1:] >= bid_px[:-1]) * bid_sz[1:] - (bid_px[1:] <= bid_px[:-1]) * bid_sz[:-1] \
+                  - (ask_px[1:] <= ask_px[:-1]) * ask_sz[1:] + (ask_px[1:] >= ask_px[:-1]) * ask_sz[:-1]
+    # the first update of each msuk has no previous one
+    codes = quotes['msuk'].cat.codes.values
+    starts = np.flatnonzero(np.diff(codes, prepend=-1))
+    ofi[starts] = 0
+    cumulative = np.cumsum(ofi)
+    cumulative -= np.repeat(cumulative[starts] - ofi[starts], np.diff(np.append(starts, len(ofi))))
+
+    return pd.DataFrame({'imbalance': imbalance, 'microprice': microprice, 'ofi': ofi, 'cumulative_ofi': cumulative},
+                        index=quotes.index)
+
+
+def level_features(dataset, levels=FEATURE_LEVELS):
+    """
+    Size imbalance of each level of the full depth book and cumulative depth imbalance of the best levels, after each
+    book update. The book of each msuk is replayed once (see models.OrderBook.levels_after). NaN for data without
+    level updates (top of the book data).
+    :param dataset: a models.Dataset with its best quotes
+    :param levels: number of levels
+    :return: dataframe with `imbalance_1`... `imbalance_{levels}` (ask minus bid size over their sum at each level) and
+    `depth_imbalance_2`... `depth_imbalance_{levels}` (the same for the total size of the best levels)
+    """
+    quotes = dataset.quotes.df
+    bid_sz, ask_sz = np.zeros((len(quotes), levels)), np.zeros((len(quotes), levels))
+    replayed = np.zeros(len(quotes), dtype=bool)
+    if 'level' in dataset.df:
+        rows, row_counts = quotes['row'].values, quotes['row_count'].values
+        for start, stop in dataset.msuk_index.values():
+            # levels are read after the last entry of each update of the msuk
+            first, last = np.searchsorted(rows, [start, stop])
+            book = OrderBook(dataset.df.iloc[start:stop])
+            book_levels = book.levels_after(rows[first:last] + row_counts[first:last] - start, levels)
+            bid_sz[first:last], ask_sz[first:last] = book_levels['bidSz'], book_levels['askSz']
+            replayed[first:last] = True
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        per_level = (ask_sz - bid_sz) / (bid_sz + ask_sz)
+        bid_depth, ask_depth = np.cumsum(bid_sz, axis=1), np.cumsum(ask_sz, axis=1)
+        cumulative = (ask_depth - bid_depth) / (bid_depth + ask_depth)
+    per_level[~replayed], cumulative[~replayed] = np.nan, np.nan
+
+    features = {f'imbalance_{level + 1}': per_level[:, level] for level in range(levels)}
+    features.update({f'depth_imbalance_{level + 1}': cumulative[:, level] for level in range(1, levels)})
+    return pd.DataFrame(features, index=quotes.index)
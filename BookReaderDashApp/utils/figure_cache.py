@@ -0,0 +1,29 @@
+import logging
+
+from flask_caching import Cache
+
+from utils.data_workflow import figure_key
+
+logger = logging.getLogger(__name__)
+
+# configured with the Flask server of the app, see app.py and settings.FIGURE_CACHE
+figure_cache = Cache()
+
+
+def cached_figure(name, build, args, **params):
+    """
+    Get a figure from the cache shared by the processes serving the app, build and store it on a miss
+    :param name: name of the figure
+    :param build: function without arguments building the figure
+    :param args: all the inputs given by callbacks
+    :param params: parameters of the figure which are not in args, e.g. feature, color scale or zoomed range
+    :return: the figure as a dict, which unpickles much faster than a plotly Figure
+    """
+    key = figure_key(name, *args, **params)
+    figure = figure_cache.get(key)
+    if figure is None:
+        figure = build().to_dict()
+        figure_cache.set(key, figure)
+    else:
+        logger.info(f"Figure {name} served from the cache")
+    return figure
@@ -1,7 +1,13 @@
+import numpy as np
+import pandas as pd
 import plotly.graph_objects as go
 
+from models import Dataset
 from settings import HOVER_TEMPLATES, EMPTY_TEMPLATE
-from utils import generate_colors
+from utils import generate_colors, POINT_BUDGETS, DOWNSAMPLING_METHOD, HEATMAP_BINS, HEATMAP_GAP, DETAIL_TOLERANCE, \
+    LIVE_POINTS
+from utils.binning import bin_2d, fill_levels
+from utils.downsampling import downsample
 import functools
 import time
 
@@ -40,23 +46,41 @@ class FigureGenerator:
 
     @classmethod
     @figure_generator
-    def figure(cls, relevant_df, feature):
+    def figure(cls, relevant_df, feature, max_points=POINT_BUDGETS['figure']):
+        relevant_df = downsample(relevant_df, [feature], max_points, DOWNSAMPLING_METHOD)
         traces = go.Scatter(x=relevant_df['datetime'], y=relevant_df[feature], mode='lines', name=feature, line_width=2)
         layout = dict(title_text=feature)
         return [traces], layout, dict()
 
-    # TODO: generate lines for different levels (not just best)
     @classmethod
     @figure_generator
-    def size_imbalance_figure(cls, relevant_df):
-        traces = go.Scatter(x=relevant_df['datetime'], y=relevant_df['size_imbalance'], mode='lines',
-                            name='size_imbalance', line_width=2)
+    def size_imbalance_figure(cls, relevant_df, levels=None, max_points=POINT_BUDGETS['size_imbalance_figure']):
+        """
+        Size imbalance on the best bid and ask, and the normalized size imbalance of each level of the book below it
+        :param relevant_df: data with `datetime` and `size_imbalance`
+        :param levels: book updates with `datetime` and `imbalance_1`... (see utils.features.level_features), None
+        for the best bid and ask only. Levels without values (top of the book data) are left out.
+        :param max_points: maximum number of points of each line
+        """
+        relevant_df = downsample(relevant_df, ['size_imbalance'], max_points, DOWNSAMPLING_METHOD)
+        traces = [go.Scatter(x=relevant_df['datetime'], y=relevant_df['size_imbalance'], mode='lines',
+                             name='size_imbalance', line_width=2)]
         layout = dict(title_text="Size Imbalance on best Bid/Ask", )
-        return [traces], layout, dict()
+
+        columns = [column for column in levels.columns if column.startswith('imbalance_')
+                   and levels[column].notna().any()] if levels is not None else []
+        if columns:
+            levels = downsample(levels, columns, max_points, DOWNSAMPLING_METHOD)
+            traces += [go.Scatter(x=levels['datetime'], y=levels[column], mode='lines', yaxis='y2', line_width=1,
+                                  name=f"Level {column.split('_')[1]}") for column in columns]
+            layout.update(title_text="Size Imbalance on best Bid/Ask and per level", legend_orientation="h",
+                          yaxis=dict(domain=[0.45, 1]), yaxis2=dict(domain=[0, 0.4], range=[-1, 1]))
+        return traces, layout, dict()
 
     @classmethod
     @figure_generator
-    def bid_ask_figure(cls, relevant_df):
+    def bid_ask_figure(cls, relevant_df, max_points=POINT_BUDGETS['bid_ask_figure']):
+        relevant_df = downsample(relevant_df, ['bidPx', 'askPx', 'bidSz', 'askSz'], max_points, DOWNSAMPLING_METHOD)
         dt = relevant_df["datetime"]
         traces = [
             go.Scatter(x=dt, y=relevant_df["bidPx"], name='Bid', mode='lines', line_color='green', line_width=2),
@@ -67,28 +91,40 @@ class FigureGenerator:
             go.Scatter(x=dt, y=relevant_df["askSz"], name='Ask Volume', mode='lines', line_color='red', yaxis='y2',
                        line_width=2),
         ]
+        if 'mid_open' in relevant_df:
+            # wide windows are plotted from bars (see utils.bars), the range of the mid within each bar is kept
+            traces.append(go.Candlestick(x=dt, open=relevant_df['mid_open'], high=relevant_df['mid_high'],
+                                         low=relevant_df['mid_low'], close=relevant_df['mid_close'], name='Mid',
+                                         opacity=0.5))
 
         layout = dict(title_text="Bid Ask and Volumes", legend_orientation="h", hovermode='x unified',
                       yaxis=dict(domain=[0.3, 1]), yaxis2=dict(domain=[0, 0.2]))
         return traces, layout, dict()
 
     @classmethod
-    @figure_generator
-    def depth_cum_figure(cls, df):
-        x = df['datetime'].drop_duplicates()
-        df['tradePctBid'] = df['tradePx'].div(df['bidPx']).round(5)
-        df['tradePctAsk'] = df['tradePx'].div(df['askPx']).round(5)
-        data_bid = df[df['direction'] == 'Buy'].pivot(index='tradePctBid', columns='datetime', values='cumulative_trade_volume')\
-                                               .fillna(method='bfill')
-        data_ask = df[df['direction'] == 'Sell'].pivot(index='tradePctAsk', columns='datetime', values='cumulative_trade_volume')\
-                                                .fillna(method='ffill')
-        data_ask = data_ask[~data_ask.index.duplicated(keep='first')]
-        data_bid = data_bid[~data_bid.index.duplicated(keep='first')]
+    def extend_data(cls, relevant_df, columns, max_points, keep_points=LIVE_POINTS):
+        """
+        extendData of a graph whose traces are columns plotted against time (figure, bid_ask_figure and
+        size_imbalance_figure), appending new entries without rebuilding the figure
+        """
+        relevant_df = downsample(relevant_df, columns, max_points, DOWNSAMPLING_METHOD)
+        x = relevant_df['datetime'].tolist()
+        data = dict(x=[x for _ in columns], y=[relevant_df[column].tolist() for column in columns])
+        return [data, list(range(len(columns))), keep_points]
 
-        traces = [
-            go.Heatmap(z=data_ask.values, x=x, y=data_ask.index, hovertemplate=HOVER_TEMPLATES['depth_figure'], colorscale='reds'),
-            go.Heatmap(z=data_bid.values, x=x, y=data_bid.index, hovertemplate=HOVER_TEMPLATES['depth_figure'], colorscale='greens'),
-        ]
+    @classmethod
+    @figure_generator
+    def depth_cum_figure(cls, df, bins=HEATMAP_BINS):
+        # the levels relative to the best prices (tradePct) are computed at load time, the window is only binned
+        traces = []
+        for direction, colorscale in (('Sell', 'reds'), ('Buy', 'greens')):
+            side = df[df['direction'] == direction]
+            z, nanos, levels = bin_2d(side['nanosEpoch'].values, side['tradePct'].values,
+                                      side['cumulative_trade_volume'].values, (bins['time'], bins['price']),
+                                      x_gap=HEATMAP_GAP)
+            z = fill_levels(z, backward=direction == 'Buy')
+            traces.append(go.Heatmap(z=z, x=pd.to_datetime(nanos), y=levels,
+                                     hovertemplate=HOVER_TEMPLATES['depth_figure'], colorscale=colorscale))
 
         layout = dict(title_text="Cumulative volumes per Trade price (in percent of best Bid/Ask)")
         x_axes = dict(showspikes=True, spikemode="across")
@@ -97,15 +133,19 @@ class FigureGenerator:
 
     @classmethod
     @figure_generator
-    def depth_non_cum_figure(cls, df, scale):
-        data = df.pivot(index='tradePx', columns='datetime', values='tradeSz')
-        x = df['datetime'].drop_duplicates()
+    def depth_non_cum_figure(cls, df, scale, quotes=None, bins=HEATMAP_BINS,
+                             max_points=POINT_BUDGETS['depth_non_cum_figure']):
+        # time buckets are labelled by their last timestamp, so that hovering a cell gives the detail of an update
+        z, nanos, prices = bin_2d(df['nanosEpoch'].values, df['tradePx'].values, df['tradeSz'].values,
+                                  (bins['time'], bins['price']), x_gap=HEATMAP_GAP)
         colorscale = generate_colors(scale)
-        best_df = df.drop_duplicates('datetime')
-        bid, ask = best_df['bidPx'], best_df['askPx']
+        quotes = Dataset.best_quotes(df) if quotes is None else quotes
+        best_df = downsample(quotes, ['bidPx', 'askPx'], max_points, DOWNSAMPLING_METHOD)
+        x, bid, ask = best_df['datetime'], best_df['bidPx'], best_df['askPx']
 
         traces = [
-            go.Heatmap(z=data.values, x=x, y=data.index, hovertemplate=HOVER_TEMPLATES['depth_figure'], colorscale=colorscale),
+            go.Heatmap(z=z, x=pd.to_datetime(nanos), y=prices, hovertemplate=HOVER_TEMPLATES['depth_figure'],
+                       colorscale=colorscale),
             go.Scatter(x=x, y=bid, name='Bid', mode='lines', line_color='green', hovertemplate=HOVER_TEMPLATES['line'],
                        line_width=2),
             go.Scatter(x=x, y=ask, name='Ask', mode='lines', line_color='red', hovertemplate=HOVER_TEMPLATES['line'],
@@ -116,6 +156,31 @@ class FigureGenerator:
         x_axes = dict(showspikes=True, spikemode="across")
         return traces, layout, x_axes
 
+    @classmethod
+    @figure_generator
+    def book_figure(cls, book_levels, bins=HEATMAP_BINS):
+        # sizes resting at each price of the replayed book, the levels of each time are summed per price bucket
+        if book_levels is None:
+            draft_template = go.layout.Template()
+            draft_template.layout.annotations = [dict(EMPTY_TEMPLATE, text="Select an msuk of line data")]
+            return [], dict(template=draft_template), dict()
+
+        times, levels = book_levels
+        x = np.repeat(times, levels['bidPx'].shape[1])
+        traces = []
+        for side, colorscale in (('ask', 'reds'), ('bid', 'greens')):
+            z, nanos, prices = bin_2d(x, levels[f'{side}Px'].ravel(), levels[f'{side}Sz'].ravel(),
+                                      (bins['time'], bins['price']), reduce='sum')
+            traces.append(go.Heatmap(z=z, x=pd.to_datetime(nanos), y=prices, colorscale=colorscale, showscale=False,
+                                     hovertemplate=HOVER_TEMPLATES['book_figure']))
+        for side, color in (('bid', 'green'), ('ask', 'red')):
+            traces.append(go.Scatter(x=pd.to_datetime(times), y=levels[f'{side}Px'][:, 0], name=f'Best {side}',
+                                     mode='lines', line_color=color, line_width=2))
+
+        layout = dict(title_text=f"Order book, {levels['bidPx'].shape[1]} levels per side")
+        x_axes = dict(showspikes=True, spikemode="across")
+        return traces, layout, x_axes
+
     @classmethod
     @figure_generator
     def trade_volume_detail(cls, ctx, df):
@@ -125,7 +190,9 @@ class FigureGenerator:
             draft_template.layout.annotations = [EMPTY_TEMPLATE]
             return [], dict(template=draft_template), dict()
         else:
-            filtered_df = df[df['datetime'] == datetime][['direction', 'tradeSz', 'tradePx']]
+            # parsed once, the rows of the timestamp are found by binary search
+            nanos = pd.Timestamp(datetime).value
+            filtered_df = Dataset.time_rows(df, nanos, DETAIL_TOLERANCE)[['direction', 'tradeSz', 'tradePx']]
             ask, bid = filtered_df[filtered_df['direction'] == 'Sell'], filtered_df[filtered_df['direction'] == 'Buy']
             ask_prices, ask_sizes = ask['tradePx'], ask['tradeSz']
             bid_prices, bid_sizes = bid['tradePx'], bid['tradeSz']
@@ -0,0 +1,82 @@
+import threading
+
+from settings import DATA_DIR, COMPACT_NUMERICS
+from models import BookReader, Dataset
+from utils.data_workflow import global_store, filtered_data_store, table_rows_store, book_store, \
+    feature_store, bar_store, partition_store
+from utils.loading import load_in_background
+
+# byte offset of the first line not loaded yet of each followed file, and the number of rows loaded up to it
+offsets = {}
+follow_lock = threading.Lock()
+
+
+def can_follow(file_path):
+    """
+    :param file_path: data file, relative to DATA_DIR
+    :return: whether new lines of the file can be loaded as it grows, only line data files are captured continuously
+    """
+    return bool(file_path) and file_path.endswith('.data')
+
+
+def follow(file_path, use_cache):
+    """
+    Load the lines written to a file since the last call and append them to its dataset in global_store, only the new
+    lines are parsed. The partitions, filtered data, table rows, books, features and bars of the file are dropped from
+    their stores, figures are rebuilt on their next update as their keys include the size of the file (see figure_key).
+    A last line still being written when the file was loaded is dropped, by loading the file again without it.
+    :param file_path: data file being written, relative to DATA_DIR
+    :param use_cache: if using cached data to load from disk
+    :return: the new entries as a Dataset, None if the file did not grow or is not loaded yet
+    """
+    key = (file_path, use_cache)
+    if not can_follow(file_path):
+        return None
+    if not global_store.contains(*key):
+        # files read by partitions are loaded in the background to be followed
+        load_in_background(file_path, use_cache, retry=False)
+        return None
+
+    # ticks of several pages are applied one at a time
+    with follow_lock:
+        stored, _ = global_store(*key)
+        dataset = stored
+        path = DATA_DIR.joinpath(file_path)
+        offset, rows = offsets.get(key, (None, None))
+        if rows != len(dataset.df):
+            # first tick, or the file was loaded again since the last one
+            offset = BookReader.line_offset(path, len(dataset.df))
+            if not _is_line_start(path, offset):
+                # the last line was still being written when the file was loaded, it is loaded again without it
+                dataset = _load_complete_lines(path)
+                offset = BookReader.line_offset(path, len(dataset.df))
+
+        df, offset = BookReader.tail(path, offset, dataset.traded_volume)
+        extended = dataset.extend(df)
+        offsets[key] = (offset, len(extended.df))
+        if extended is stored:
+            return None
+
+        global_store.store((extended, extended.msuk_options()), *key)
+        partition_store.invalidate(file_path=file_path)
+        filtered_data_store.invalidate(file_path=file_path)
+        table_rows_store.invalidate(file_path=file_path)
+        book_store.invalidate(file_path=file_path)
+        feature_store.invalidate(file_path=file_path)
+        bar_store.invalidate(file_path=file_path)
+    return Dataset(df) if len(df) else None
+
+
+def _is_line_start(path, offset):
+    if not offset:
+        return True
+    with open(path, mode='rb') as f:
+        f.seek(offset - 1)
+        return f.read(1) == b'\n'
+
+
+def _load_complete_lines(path):
+    df = BookReader.load(path, complete_lines=True)
+    if COMPACT_NUMERICS:
+        BookReader.downcast(df)
+    return Dataset(df)
@@ -0,0 +1,73 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+from settings import COMPACT_NUMERICS, LOADING_WORKERS
+from utils.data_workflow import global_store, bar_store, load_data
+from utils.catalog import update_catalog, describe, read_manifest, write_manifest, manifest_lock
+
+logger = logging.getLogger(__name__)
+
+# files are loaded in global_store by a pool of threads, so that callbacks return while they load
+executor = ThreadPoolExecutor(max_workers=LOADING_WORKERS, thread_name_prefix='loading')
+jobs = {}
+jobs_lock = threading.Lock()
+
+
+def load_in_background(file_path, use_cache, retry=True):
+    """
+    Load a file in global_store in the background, unless it is already loaded or loading
+    :param file_path: file to load
+    :param use_cache: if using cached data to load from disk
+    :param retry: if loading again a file whose last job failed, False when polling the progress of a job
+    :return: future of the loading job, its result is the result of global_store
+    """
+    key = (file_path, use_cache)
+    with jobs_lock:
+        job = jobs.get(key)
+        # files evicted from global_store are loaded again, failed files only when retrying
+        if job is None or job.done() and (job.exception() is not None and retry
+                                          or job.exception() is None and not global_store.contains(*key)):
+            job = executor.submit(_load, file_path, use_cache)
+            jobs[key] = job
+        return job
+
+
+def _load(file_path, use_cache):
+    # loaded files are described in the catalog, to fill the layout without loading them next time
+    dataset, msuks_options = global_store(file_path, use_cache)
+    # bars are built (or read from their cache) with the file, wide windows are plotted from them
+    bar_store(file_path=file_path, use_cache=use_cache)
+    try:
+        update_catalog(file_path, dataset.df)
+    except OSError as e:
+        logger.warning(f"Could not update the catalog with {file_path}: {e}")
+    return dataset, msuks_options
+
+
+def warm_up_cache(files, workers=LOADING_WORKERS):
+    """
+    Parse files and write their disk cache in a process pool, files with a fresh cache are skipped
+    :param files: data files, relative to DATA_DIR
+    :param workers: number of processes
+    :return: files which could not be cached
+    """
+    failed, descriptions = [], {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_cache_file, file): file for file in files}
+        for future in as_completed(futures):
+            try:
+                descriptions[futures[future]] = future.result()
+                logger.info(f"Cache ready for {futures[future]}")
+            except Exception as e:
+                logger.warning(f"Could not cache {futures[future]}: {e}")
+                failed.append(futures[future])
+    # the catalog is written once by the parent process, the processes would overwrite each other
+    with manifest_lock:
+        write_manifest({**read_manifest(), **descriptions})
+    return failed
+
+
+def _cache_file(file):
+    # only the description of the file is returned, the data stays in the disk cache
+    return describe(file, load_data(file, use_cache=True, columns=['nanosEpoch', 'msuk'], downcast=COMPACT_NUMERICS))
@@ -0,0 +1,142 @@
+import functools
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+def memory_cache(budget):
+    """
+    Memoize a function in a MemoryCache, a memory bounded replacement for functools.lru_cache
+    :param budget: maximum bytes held by the cached results
+    :return: decorator
+    """
+    def decorator(func):
+        cache = MemoryCache(func, budget)
+        functools.update_wrapper(cache, func)
+        return cache
+
+    return decorator
+
+
+class MemoryCache:
+    """
+    Least recently used cache of function results, bounded by the memory used by the results.
+
+    Results are sized with `memory_usage(deep=True)` for dataframes (and objects exposing it), least recently used
+    entries are evicted once the budget is exceeded. Pinned entries are never evicted, the most recent result is kept
+    even if it exceeds the budget on its own.
+    Zero-copy slices of other cached results are counted at their full size, the budget is an upper bound.
+    """
+
+    def __init__(self, func, budget):
+        self.func = func
+        self.budget = budget
+        self.entries = OrderedDict()
+        self.pinned = set()
+        self.hits = self.misses = self.evictions = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        key = self._key(args, kwargs)
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return self.entries[key][0]
+            self.misses += 1
+
+        # computed outside the lock, concurrent misses on the same key may compute twice
+        value = self.func(*args, **kwargs)
+        size = sizeof(value)
+        with self.lock:
+            self.entries[key] = (value, size)
+            self.entries.move_to_end(key)
+            self._evict(keep=key)
+        return value
+
+    def _evict(self, keep):
+        total = sum(size for _, size in self.entries.values())
+        for key in list(self.entries):
+            if total <= self.budget:
+                break
+            if key == keep or key in self.pinned:
+                continue
+            total -= self.entries.pop(key)[1]
+            self.evictions += 1
+
+    @staticmethod
+    def _key(args, kwargs):
+        return args + tuple(sorted(kwargs.items()))
+
+    def contains(self, *args, **kwargs):
+        """
+        Whether the result of a call is cached, without computing it.
+        """
+        with self.lock:
+            return self._key(args, kwargs) in self.entries
+
+    def store(self, value, *args, **kwargs):
+        """
+        Replace the cached result of a call, e.g. by an updated version of it.
+        """
+        size = sizeof(value)
+        key = self._key(args, kwargs)
+        with self.lock:
+            self.entries[key] = (value, size)
+            self.entries.move_to_end(key)
+            self._evict(keep=key)
+
+    def invalidate(self, **kwargs):
+        """
+        Drop the cached results of the calls with these keyword arguments, e.g. computed from an outdated file.
+        """
+        items = set(kwargs.items())
+        with self.lock:
+            for key in [key for key in self.entries if items.issubset(item for item in key if isinstance(item, tuple))]:
+                del self.entries[key]
+
+    def pin(self, *args, **kwargs):
+        """
+        Protect the result of a call from eviction, whether it is already cached or not.
+        """
+        with self.lock:
+            self.pinned.add(self._key(args, kwargs))
+
+    def unpin(self, *args, **kwargs):
+        with self.lock:
+            self.pinned.discard(self._key(args, kwargs))
+
+    def unpin_all(self):
+        with self.lock:
+            self.pinned.clear()
+
+    def cache_info(self):
+        """
+        :return: counters and memory used by the cache
+        """
+        with self.lock:
+            return dict(hits=self.hits, misses=self.misses, evictions=self.evictions, entries=len(self.entries),
+                        bytes=sum(size for _, size in self.entries.values()), budget=self.budget,
+                        pinned=len(self.pinned))
+
+    def cache_clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+def sizeof(value):
+    """
+    :param value: a cached result
+    :return: approximate bytes used by the value
+    """
+    if hasattr(value, 'memory_usage'):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(sizeof(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(item) for item in value.values())
+    return sys.getsizeof(value)
@@ -1,9 +1,17 @@
+# Version of the figures, part of the keys of the figure cache with the settings below which they depend on (see
+# utils.data_workflow.figure_key): to bump whenever a change to utils.figure_configs alters the figures.
+FIGURE_VERSION = 4
+
 FEATURES = [
     {"label": "Bid Size", "value": "bidSz"},
     {"label": "Bid Price", "value": "bidPx"},
     {"label": "Ask Size", "value": "askSz"},
     {"label": "Ask Price", "value": "askPx"},
     {"label": "Spread", "value": "spread"},
+    {"label": "Normalized Size Imbalance", "value": "imbalance"},
+    {"label": "Microprice", "value": "microprice"},
+    {"label": "Order Flow Imbalance", "value": "ofi"},
+    {"label": "Cumulative Order Flow Imbalance", "value": "cumulative_ofi"},
 ]
 
 TIME_RANGES = {
@@ -13,6 +21,39 @@ TIME_RANGES = {
     'microsecond': {'min': 0, 'max': 1000000}
 }
 
+# Rows per page of the data table, paged on the server
+TABLE_PAGE_SIZE = 50
 COLUMNS_FOR_DATA_TABLE = ['time', 'date', 'bidSz', 'bidPx', 'askPx', 'askSz', 'tradePx', 'tradeSz', 'direction']
 
-APP_INPUTS = ['file_path', 'date', 'msuk', 'use_cache', 'hour', 'minute', 'second', 'micros']
\ No newline at end of file
+APP_INPUTS = ['file_path', 'date', 'msuk', 'use_cache', 'hour', 'minute', 'second', 'micros']
+
+# Maximum number of points sent to the browser for the line charts of each figure (None to send all of them), and
+# the downsampling method, 'lttb' or 'minmax' (see utils.downsampling).
+POINT_BUDGETS = {'figure': 2000, 'bid_ask_figure': 4000, 'size_imbalance_figure': 2000, 'depth_non_cum_figure': 2000}
+DOWNSAMPLING_METHOD = 'lttb'
+
+# Maximum size of the time × price grid of the depth heatmaps (see utils.binning), about the size of the graphs in
+# pixels: a finer grid would not be visible, a zoom re-bins the visible range.
+HEATMAP_BINS = {'time': 800, 'price': 300}
+# Longest gap, in nanoseconds, between timestamps of a heatmap binned at its actual length: longer gaps (e.g. nights of
+# multi-day windows) take the time buckets of this length only, the buckets are spread over the populated time.
+HEATMAP_GAP = 10 * 60 * 10 ** 9
+
+# Number of levels on each side of the full depth book replayed for the book figure, see models.OrderBook
+BOOK_DEPTH = 10
+
+# Number of levels of the per level and cumulative depth imbalance features of line data, see utils.features
+FEATURE_LEVELS = 5
+FEATURES += [{"label": f"Normalized Size Imbalance (level {level})", "value": f"imbalance_{level}"}
+             for level in range(1, FEATURE_LEVELS + 1)]
+FEATURES += [{"label": f"Normalized Depth Imbalance (best {level} levels)", "value": f"depth_imbalance_{level}"}
+             for level in range(2, FEATURE_LEVELS + 1)]
+
+# Maximum distance, in nanoseconds, between a hovered or clicked time and the update shown in detail: the browser
+# rounds times below the millisecond.
+DETAIL_TOLERANCE = 10 ** 6
+
+# Period, in milliseconds, at which followed files are polled for new lines, and maximum number of points kept by each
+# line of the graphs they extend (the oldest are dropped), see utils.live
+LIVE_INTERVAL = 1000
+LIVE_POINTS = 20000
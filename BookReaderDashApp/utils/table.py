@@ -0,0 +1,136 @@
+import operator
+import re
+
+import numpy as np
+import pandas as pd
+
+from models import DataReader
+
+# operators of the filter queries of dash_table.DataTable, longest symbols first so that '<=' is not read as '<'
+FILTER_OPERATORS = [('ge', '>='), ('le', '<='), ('lt', '<'), ('gt', '>'), ('ne', '!='), ('eq', '='),
+                    ('contains',), ('datestartswith',)]
+COMPARISONS = {'ge': operator.ge, 'le': operator.le, 'lt': operator.lt, 'gt': operator.gt, 'ne': operator.ne,
+               'eq': operator.eq}
+
+# calendar columns of the table are computed from nanosEpoch, as day numbers and nanoseconds of the day
+CALENDAR_COLUMNS = ('date', 'time')
+NANOS_PER_DAY = 24 * 3600 * 10 ** 9
+
+
+def table_page(df, rows, page_current, page_size, columns):
+    """
+    Records of one page of the data table, only the rows of the page are serialized
+    :param df: filtered data
+    :param rows: positions of the rows of df to display, in order, see table_rows
+    :param page_current: page number, from 0
+    :param page_size: number of rows per page
+    :param columns: columns of the table
+    :return: list of records
+    """
+    page = df.iloc[rows[page_current * page_size:(page_current + 1) * page_size]]
+    page = page.join(DataReader.time_columns(page, ('date', 'time')))
+    return page[columns].to_dict('records')
+
+
+def table_rows(df, sort_by=(), filter_query=''):
+    """
+    Positions of the rows kept by the filter query of the table, in the order of its sort
+    :param df: filtered data
+    :param sort_by: (column_id, direction) pairs, direction being 'asc' or 'desc'
+    :param filter_query: filter_query of a dash_table.DataTable, e.g. '{tradeSz} > 10 && {direction} = Buy'
+    :return: array of row positions
+    """
+    conditions = [split_filter_part(part) for part in (filter_query or '').split(' && ') if part]
+    conditions = [condition for condition in conditions if condition[0] in CALENDAR_COLUMNS or condition[0] in df]
+    columns = {column for column, _, _ in conditions} | {column for column, _ in sort_by}
+    view = pd.DataFrame({column: table_column(df, column) for column in columns})
+
+    mask = np.ones(len(df), dtype=bool)
+    for column, operator_type, value in conditions:
+        if operator_type in COMPARISONS:
+            mask &= compare(view[column], column, operator_type, value)
+        elif operator_type == 'contains':
+            mask &= table_text(df, view, column).str.contains(value, regex=False).values
+        elif operator_type == 'datestartswith':
+            mask &= table_text(df, view, column).str.startswith(value).values
+    rows = np.flatnonzero(mask)
+
+    if sort_by:
+        ordered = view.iloc[rows].reset_index(drop=True)
+        order = ordered.sort_values([column for column, _ in sort_by], kind='mergesort',
+                                    ascending=[direction == 'asc' for _, direction in sort_by]).index.values
+        rows = rows[order]
+    return rows
+
+
+def table_column(df, column):
+    """
+    :param df: filtered data
+    :param column: id of a column of the table
+    :return: values of the column with a default index, day numbers and nanoseconds of the day for the calendar columns
+    """
+    if column == 'date':
+        return pd.Series(df['nanosEpoch'].values // NANOS_PER_DAY)
+    if column == 'time':
+        return pd.Series(df['nanosEpoch'].values % NANOS_PER_DAY)
+    return df[column].reset_index(drop=True)
+
+
+def table_text(df, view, column):
+    """
+    :return: values of a column of the table as displayed, for text conditions
+    """
+    if column not in CALENDAR_COLUMNS:
+        return view[column].astype(str)
+    text = np.datetime_as_string(df['nanosEpoch'].values.astype('datetime64[ns]'), unit='us')
+    return pd.Series(text.astype('U10') if column == 'date' else np.char.partition(text, 'T')[:, 2])
+
+
+def compare(values, column, operator_type, value):
+    """
+    :param values: values of a column of the table, see table_column
+    :param column: id of the column
+    :param operator_type: comparison of the condition, among COMPARISONS
+    :param value: value of the condition
+    :return: mask of the rows satisfying the condition, none of them if the value does not fit the column or cannot be
+    compared with it
+    """
+    try:
+        if column == 'date':
+            value = pd.Timestamp(str(value)).value // NANOS_PER_DAY
+        elif column == 'time':
+            value = pd.Timestamp(f'1970-01-01 {value}').value
+        elif isinstance(values.dtype, pd.CategoricalDtype) or \
+                pd.api.types.is_numeric_dtype(values) != isinstance(value, float):
+            # categories are unordered, they are compared as strings
+            values, value = values.astype(str), str(value)
+        return COMPARISONS[operator_type](values, value).values
+    except (ValueError, TypeError):
+        return np.zeros(len(values), dtype=bool)
+
+
+def split_filter_part(filter_part):
+    """
+    Parse one condition of a filter query, as written by the filter row of a dash_table.DataTable
+    :param filter_part: e.g. '{tradeSz} ge 10' or '{direction} contains Bu'
+    :return: column id, operator type and value (a float for numeric comparisons), (None, None, None) if the condition
+    cannot be parsed
+    """
+    match = re.match(r'\s*\{(?P<name>[^}]*)\}\s*(?P<condition>.*)', filter_part)
+    if match is None:
+        return None, None, None
+    condition = match['condition']
+    for operators in FILTER_OPERATORS:
+        symbol = next((symbol for symbol in operators if condition.startswith(symbol)), None)
+        if symbol is None:
+            continue
+        value = condition[len(symbol):].strip()
+        if value and value[0] == value[-1] and value[0] in ('"', "'", '`'):
+            value = value[1:-1].replace('\\' + value[0], value[0])
+        elif operators[0] in COMPARISONS:
+            try:
+                value = float(value)
+            except ValueError:
+                pass
+        return match['name'], operators[0], value
+    return None, None, None
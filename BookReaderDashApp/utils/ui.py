@@ -42,10 +42,19 @@ def generate_slider(id_bs, id_rs, min, max, step, value, marks_delta, symbol):
 
     return slider
 
-def generate_datatable(id):
+def generate_datatable(id, page_size=50):
+    # rows are paged, sorted and filtered by a callback, only the current page is sent to the browser
     table = dash_table.DataTable(
             id=id,
             columns=COLUMNS_DATATABLE,
+            page_current=0,
+            page_size=page_size,
+            page_action='custom',
+            sort_action='custom',
+            sort_mode='multi',
+            sort_by=[],
+            filter_action='custom',
+            filter_query='',
             # TODO CLean the style below
             style_data_conditional=[
                {
@@ -71,7 +80,7 @@ def generate_datatable(id):
             },
             merge_duplicate_headers=True
         )
-    return table
+    return html.Div([html.Div(id=f'{id}_row_count', className='rowcount'), table])
 
 
 def generate_colors(scale):